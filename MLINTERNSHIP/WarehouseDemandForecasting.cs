@@ -1332,9 +1332,6 @@ namespace MLINTERNSHIP
                     };
                     var jsonInput = JsonConvert.SerializeObject(inputData);
 
-                    var tempFilePath = Path.GetTempFileName();
-                    File.WriteAllText(tempFilePath, jsonInput);
-
                     // Resolve python and script path inside container and locally
                     var pythonPath = "python3"; // rely on PATH (venv is added in container)
 
@@ -1365,7 +1362,8 @@ namespace MLINTERNSHIP
                                StartInfo = new ProcessStartInfo
                                {
                                    FileName = pythonPath,
-                                   Arguments = $"\"{resolvedScriptPath}\" \"{tempFilePath}\"",
+                                   Arguments = $"\"{resolvedScriptPath}\"",
+                                   RedirectStandardInput = true,
                                    RedirectStandardOutput = true,
                                    RedirectStandardError = true,
                                    UseShellExecute = false,
@@ -1374,6 +1372,11 @@ namespace MLINTERNSHIP
                            })
                     {
                         process.Start();
+
+                        // Pipe the payload over stdin instead of a temp file round trip
+                        process.StandardInput.Write(jsonInput);
+                        process.StandardInput.Close();
+
                         if (!process.WaitForExit(30000)) // 30 second timeout
                         {
                             process.Kill();
@@ -1384,7 +1387,6 @@ namespace MLINTERNSHIP
 
                         string output = process.StandardOutput.ReadToEnd();
                         string error = process.StandardError.ReadToEnd();
-                        File.Delete(tempFilePath);
 
                         if (process.ExitCode == 0 && !string.IsNullOrWhiteSpace(output))
                         {
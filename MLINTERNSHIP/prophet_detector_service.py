@@ -0,0 +1,342 @@
+"""
+Local asyncio service in front of prophet_seasonal_detector.py.
+
+Speaks the detector's newline-delimited JSON worker protocol over a Unix socket or a
+localhost TCP port, with three additions for busy frontends:
+
+- identical in-flight requests (same payload apart from id/priority) share one fit;
+- requests wait in a priority queue ('interactive' < 'normal' < 'bulk', or any int,
+  lower first) drained by a bounded pool of warm worker processes;
+- queue depth, running fits and queue wait times are exposed through a
+  {"command": "stats"} request and, optionally, a Prometheus textfile.
+
+Responses on one connection can arrive out of order; match them by "id".
+"""
+
+import os
+import sys
+import json
+import time
+import asyncio
+import signal
+import hashlib
+import argparse
+import itertools
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import prophet_seasonal_detector as detector
+
+PRIORITY_LEVELS = {'interactive': 0, 'normal': 5, 'bulk': 10}
+DEFAULT_PRIORITY = 'normal'
+
+# Request fields that do not change the result and so do not split coalescing
+REQUEST_ONLY_FIELDS = ['id', 'priority']
+
+WAIT_SECONDS_BUCKETS = [0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 300.0]
+METRICS_INTERVAL_SECONDS = 5.0
+
+# A worker dying (OOM, cmdstan crash) fails every fit running in its pool; each gets this
+# many retries on a fresh pool, so only a payload that keeps killing workers errors out
+BROKEN_POOL_RETRIES = 1
+
+# Long histories make for long request lines
+MAX_REQUEST_BYTES = 256 * 1024 * 1024
+
+def resolve_priority(value):
+    """Numeric priority for a request's 'priority' field (lower runs first)"""
+    if value is None:
+        value = DEFAULT_PRIORITY
+    if isinstance(value, str):
+        if value not in PRIORITY_LEVELS:
+            raise ValueError(f"Unknown priority '{value}' (expected one of {list(PRIORITY_LEVELS)} or an integer)")
+        return PRIORITY_LEVELS[value]
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        raise ValueError(f"Invalid priority {json.dumps(value)} (expected one of {list(PRIORITY_LEVELS)} or an integer)")
+    return int(value)
+
+def priority_label(priority):
+    names = {level: name for name, level in PRIORITY_LEVELS.items()}
+    return names.get(priority, str(priority))
+
+def coalescing_key(payload):
+    """Hash of everything in the payload that can influence the result"""
+    fields = {key: value for key, value in payload.items() if key not in REQUEST_ONLY_FIELDS}
+    return hashlib.sha256(json.dumps(fields, sort_keys=True).encode('utf-8')).hexdigest()
+
+def init_worker():
+    """Pool initializer: shed the service's SIGTERM handling inherited through fork, then warm up"""
+    # A forked worker shares the event loop's signal wakeup fd, so a SIGTERM sent to the worker
+    # (the pool terminates survivors when one dies) would otherwise also shut the service down
+    signal.set_wakeup_fd(-1)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    detector.warm_up()
+
+def run_detection(payload, received_at):
+    """Pool worker: fit one payload, returning errors as results"""
+    try:
+        result = detector.detect_seasonality(payload, received_at)
+    except Exception as e:
+        result = {'error': str(e)}
+    detector.record_metrics(result, error='error' in result)
+    return result
+
+class Job:
+    """One distinct fit, shared by every request that asked for it while it was pending"""
+    
+    def __init__(self, key, payload, priority):
+        self.key = key
+        self.payload = payload
+        self.priority = priority
+        self.received_at = time.time()  # Deadlines count from the first request's arrival
+        self.enqueued_at = time.perf_counter()
+        self.future = asyncio.get_running_loop().create_future()
+        self.started = False
+
+class DetectorService:
+    """Coalescing priority scheduler over a bounded pool of detector processes"""
+    
+    def __init__(self, max_workers):
+        self.max_workers = max_workers
+        self.pool = self.new_pool()
+        self.queue = asyncio.PriorityQueue()
+        self.sequence = itertools.count()
+        self.jobs = {}  # Coalescing key -> pending or running Job
+        self.queued = 0
+        self.running = 0
+        self.counters = {'requests': {}, 'coalesced': 0, 'completed': 0, 'errors': 0, 'pool_restarts': 0}
+        self.wait_seconds = {}
+    
+    def new_pool(self):
+        return ProcessPoolExecutor(max_workers=self.max_workers, initializer=init_worker)
+    
+    def replace_broken_pool(self, pool):
+        """Swap in a fresh pool; every slot that saw the same pool break calls this, only the first swaps"""
+        if self.pool is pool:
+            self.pool = self.new_pool()
+            self.counters['pool_restarts'] += 1
+            pool.shutdown(wait=False, cancel_futures=True)
+            print("Warning: a detector worker process died; restarted the worker pool", file=sys.stderr)
+    
+    async def run_job(self, job):
+        """Fit a job in the pool, retrying on a fresh pool when a worker process dies under it"""
+        loop = asyncio.get_running_loop()
+        for _ in range(1 + BROKEN_POOL_RETRIES):
+            pool = self.pool
+            try:
+                return await loop.run_in_executor(pool, run_detection, job.payload, job.received_at)
+            except BrokenProcessPool as e:
+                self.replace_broken_pool(pool)
+                error = e
+        return {'error': f"Worker process died: {str(error)}"}
+    
+    def submit(self, payload):
+        """Future for the payload's result, joining an identical in-flight fit when there is one"""
+        priority = resolve_priority(payload.get('priority'))
+        label = priority_label(priority)
+        self.counters['requests'][label] = self.counters['requests'].get(label, 0) + 1
+        
+        key = coalescing_key(payload)
+        job = self.jobs.get(key)
+        if job is not None:
+            self.counters['coalesced'] += 1
+            if not job.started and priority < job.priority:
+                # Re-queue at the better priority; the stale entry is skipped when it surfaces
+                job.priority = priority
+                self.queue.put_nowait((priority, next(self.sequence), job))
+            return job.future
+        
+        fields = {key: value for key, value in payload.items() if key not in REQUEST_ONLY_FIELDS}
+        job = Job(key, fields, priority)
+        self.jobs[key] = job
+        self.queued += 1
+        self.queue.put_nowait((priority, next(self.sequence), job))
+        return job.future
+    
+    def observe_wait(self, priority, seconds):
+        histogram = self.wait_seconds.setdefault(
+            priority_label(priority), {'buckets': [0] * len(WAIT_SECONDS_BUCKETS), 'sum': 0.0, 'count': 0, 'max': 0.0})
+        for i, upper_bound in enumerate(WAIT_SECONDS_BUCKETS):
+            if seconds <= upper_bound:
+                histogram['buckets'][i] += 1
+        histogram['sum'] += seconds
+        histogram['count'] += 1
+        histogram['max'] = max(histogram['max'], seconds)
+    
+    async def run_slot(self):
+        """One of max_workers loops that keep the pool busy in priority order"""
+        while True:
+            _, _, job = await self.queue.get()
+            if job.started:
+                continue
+            job.started = True
+            self.queued -= 1
+            self.running += 1
+            self.observe_wait(job.priority, time.perf_counter() - job.enqueued_at)
+            try:
+                result = await self.run_job(job)
+            except Exception as e:
+                result = {'error': f"Worker failed: {str(e)}"}
+            finally:
+                self.running -= 1
+                del self.jobs[job.key]
+            self.counters['completed'] += 1
+            if 'error' in result:
+                self.counters['errors'] += 1
+            job.future.set_result(result)
+    
+    def snapshot(self):
+        """Current queue state and cumulative counters"""
+        return {
+            'queue_depth': self.queued,
+            'running': self.running,
+            'max_workers': self.max_workers,
+            'requests_total': dict(self.counters['requests']),
+            'coalesced_total': self.counters['coalesced'],
+            'completed_total': self.counters['completed'],
+            'errors_total': self.counters['errors'],
+            'pool_restarts_total': self.counters['pool_restarts'],
+            'wait_seconds': {
+                label: {'count': h['count'], 'sum': round(h['sum'], 6), 'max': round(h['max'], 6)}
+                for label, h in self.wait_seconds.items()
+            }
+        }
+    
+    def render_metrics(self):
+        """Prometheus text exposition of the queue state"""
+        lines = [
+            '# HELP prophet_service_queue_depth Distinct fits waiting for a worker',
+            '# TYPE prophet_service_queue_depth gauge',
+            f'prophet_service_queue_depth {self.queued}',
+            '# HELP prophet_service_running Fits currently running',
+            '# TYPE prophet_service_running gauge',
+            f'prophet_service_running {self.running}',
+            '# HELP prophet_service_requests_total Requests received, by priority',
+            '# TYPE prophet_service_requests_total counter'
+        ]
+        for label, count in sorted(self.counters['requests'].items()):
+            lines.append(f'prophet_service_requests_total{{priority="{label}"}} {count}')
+        for name, help_text in [('coalesced', 'Requests that joined an identical in-flight fit'),
+                                ('completed', 'Distinct fits completed'),
+                                ('errors', 'Distinct fits that returned an error'),
+                                ('pool_restarts', 'Worker pools replaced after a worker process died')]:
+            lines.append(f'# HELP prophet_service_{name}_total {help_text}')
+            lines.append(f'# TYPE prophet_service_{name}_total counter')
+            lines.append(f'prophet_service_{name}_total {self.counters[name]}')
+        
+        lines.append('# HELP prophet_service_wait_seconds Time fits spent queued before a worker picked them up')
+        lines.append('# TYPE prophet_service_wait_seconds histogram')
+        for label, histogram in sorted(self.wait_seconds.items()):
+            for upper_bound, count in zip(WAIT_SECONDS_BUCKETS, histogram['buckets']):
+                lines.append(f'prophet_service_wait_seconds_bucket{{priority="{label}",le="{upper_bound}"}} {count}')
+            lines.append(f'prophet_service_wait_seconds_bucket{{priority="{label}",le="+Inf"}} {histogram["count"]}')
+            lines.append(f'prophet_service_wait_seconds_sum{{priority="{label}"}} {histogram["sum"]}')
+            lines.append(f'prophet_service_wait_seconds_count{{priority="{label}"}} {histogram["count"]}')
+        return '\n'.join(lines) + '\n'
+    
+    async def write_metrics_periodically(self, metrics_path):
+        while True:
+            tmp_path = f'{metrics_path}.{os.getpid()}.tmp'
+            try:
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    f.write(self.render_metrics())
+                os.replace(tmp_path, metrics_path)
+            except OSError as e:
+                print(f"Warning: could not update metrics file {metrics_path}: {str(e)}", file=sys.stderr)
+            await asyncio.sleep(METRICS_INTERVAL_SECONDS)
+    
+    async def respond(self, line, writer):
+        try:
+            request = json.loads(line)
+        except ValueError as e:
+            request, response = None, {'error': f"Invalid JSON request: {str(e)}"}
+        else:
+            if not isinstance(request, dict):
+                response = {'error': 'Request must be a JSON object'}
+            elif request.get('command') == 'stats':
+                response = self.snapshot()
+            else:
+                try:
+                    # Coalesced requests share the result object; each response gets its own copy
+                    response = dict(await self.submit(request))
+                except (TypeError, ValueError) as e:
+                    response = {'error': str(e)}
+        
+        # Echo the caller's correlation id so responses can be matched to requests
+        if isinstance(request, dict) and 'id' in request:
+            response['id'] = request['id']
+        writer.write((json.dumps(response) + '\n').encode('utf-8'))
+        await writer.drain()
+    
+    async def handle_connection(self, reader, writer):
+        """Read requests as they arrive and answer each as soon as its fit is done"""
+        pending = set()
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                if not line.strip():
+                    continue
+                task = asyncio.create_task(self.respond(line.decode('utf-8'), writer))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+            if pending:
+                await asyncio.gather(*pending, return_exceptions=True)
+        finally:
+            writer.close()
+
+async def serve(args):
+    service = DetectorService(args.max_workers or detector.default_pool_size())
+    slots = [asyncio.create_task(service.run_slot()) for _ in range(service.max_workers)]
+    if args.queue_metrics_file:
+        slots.append(asyncio.create_task(service.write_metrics_periodically(args.queue_metrics_file)))
+    
+    if args.socket:
+        if os.path.exists(args.socket):
+            os.unlink(args.socket)
+        server = await asyncio.start_unix_server(service.handle_connection, path=args.socket, limit=MAX_REQUEST_BYTES)
+    else:
+        server = await asyncio.start_server(service.handle_connection, '127.0.0.1', args.port, limit=MAX_REQUEST_BYTES)
+    print(f"Detector service listening on {args.socket or f'127.0.0.1:{args.port}'} "
+          f"with {service.max_workers} workers", file=sys.stderr)
+    
+    try:
+        # SIGTERM unwinds through the cleanup below instead of killing the process outright
+        asyncio.get_running_loop().add_signal_handler(signal.SIGTERM, asyncio.current_task().cancel)
+    except (NotImplementedError, AttributeError):
+        pass  # No loop signal handlers on Windows
+    
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        for task in slots:
+            task.cancel()
+        service.pool.shutdown(cancel_futures=True)
+        if args.socket and os.path.exists(args.socket):
+            os.unlink(args.socket)
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description='Coalescing, prioritized local service for the seasonal detector')
+    parser.add_argument('--socket', help='Listen on this Unix socket instead of a TCP port')
+    parser.add_argument('--port', type=int, default=8765, help='Localhost TCP port (default: 8765)')
+    parser.add_argument('--max-workers', type=int, default=None,
+                        help='Detector processes fitting in parallel (default: CPU count)')
+    parser.add_argument('--metrics-file',
+                        help='Prometheus textfile for per-fit detector metrics (default: $PROPHET_METRICS_FILE)')
+    parser.add_argument('--queue-metrics-file',
+                        help=f'Prometheus textfile rewritten every {METRICS_INTERVAL_SECONDS:g}s with queue metrics')
+    return parser.parse_args(argv)
+
+def main():
+    args = parse_args(sys.argv[1:])
+    if args.metrics_file:
+        os.environ['PROPHET_METRICS_FILE'] = args.metrics_file
+    try:
+        asyncio.run(serve(args))
+    except (KeyboardInterrupt, asyncio.CancelledError):
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,258 @@
+"""
+Fork-server launcher for prophet_seasonal_detector.py.
+
+Takes the same arguments, stdin and stdout as the detector, so a caller can switch by
+changing the script path. The first call starts a background server that imports
+pandas/prophet and loads the Stan model once; every later call hands its stdin, stdout
+and stderr to that server, which forks an already-warm child to run the detector's
+main() and reports the exit code back. Each request still gets its own process.
+
+The socket lives in $XDG_RUNTIME_DIR or a private per-user directory under the temp
+directory, and both ends check that the other side runs as the same user.
+
+Without fork/AF_UNIX (Windows) or when the server cannot be reached, the request runs
+in-process exactly like the detector would.
+"""
+
+import time
+_CLIENT_STARTED = time.time()
+
+import os
+import sys
+import json
+import stat
+import socket
+import signal
+import struct
+import tempfile
+import threading
+import subprocess
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+DETECTOR_DIR = os.path.dirname(os.path.abspath(__file__))
+DETECTOR_PATH = os.path.join(DETECTOR_DIR, 'prophet_seasonal_detector.py')
+
+# Idle servers exit so a stopped caller does not leave a warm process behind forever
+DEFAULT_IDLE_SECONDS = 1800
+# Exit code reported when the child dies without sending one (e.g. killed by a signal)
+CHILD_FAILED_EXIT_CODE = 1
+
+def private_directory(path):
+    """True for a real directory owned by this user that no one else can enter"""
+    try:
+        st = os.lstat(path)
+    except OSError:
+        return False
+    return stat.S_ISDIR(st.st_mode) and st.st_uid == os.getuid() and not st.st_mode & 0o077
+
+def socket_path():
+    """Socket inside a directory only this user can reach, or None when there is none
+
+    Clients hand their environment and stdio to whoever listens there, so the default
+    never lives directly in a shared directory such as /tmp.
+    """
+    if os.environ.get('PROPHET_FORKSERVER_SOCKET'):
+        return os.environ['PROPHET_FORKSERVER_SOCKET']
+    if not hasattr(os, 'getuid'):
+        return None
+    
+    runtime_dir = os.environ.get('XDG_RUNTIME_DIR')
+    if runtime_dir and private_directory(runtime_dir):
+        return os.path.join(runtime_dir, 'prophet_forkserver.sock')
+    
+    directory = os.path.join(tempfile.gettempdir(), f"prophet_forkserver-{os.getuid()}")
+    try:
+        os.mkdir(directory, 0o700)
+    except FileExistsError:
+        pass
+    except OSError:
+        return None
+    # A directory someone else created under our name (or made accessible) is not used
+    return os.path.join(directory, 'server.sock') if private_directory(directory) else None
+
+def peer_uid(conn):
+    """uid of the process at the other end of a Unix socket, or None where the OS does not say"""
+    if not hasattr(socket, 'SO_PEERCRED'):
+        return None
+    credentials = conn.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize('3i'))
+    return struct.unpack('3i', credentials)[1]
+
+def forking_supported():
+    return hasattr(os, 'fork') and hasattr(socket, 'AF_UNIX') and hasattr(socket, 'send_fds') and fcntl is not None
+
+def run_detector(argv, started_at):
+    """Run the detector's main() in this process; returns its exit code"""
+    sys.path.insert(0, DETECTOR_DIR)
+    import prophet_seasonal_detector as detector
+    # Deadlines count from the caller's process start, not from the server's imports
+    detector._IMPORT_STARTED = time.perf_counter() - (time.time() - started_at)
+    sys.argv = [DETECTOR_PATH] + argv
+    try:
+        detector.main()
+    except SystemExit as e:
+        return e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+    finally:
+        sys.stdout.flush()
+        sys.stderr.flush()
+    return 0
+
+def read_line(conn, buffered=b''):
+    """Read up to and including the first newline on a stream socket"""
+    while b'\n' not in buffered:
+        chunk = conn.recv(65536)
+        if not chunk:
+            break
+        buffered += chunk
+    return buffered.split(b'\n', 1)[0]
+
+def watch_client(conn, finished):
+    """Watcher thread in a forked child: kill the child's process group once its client goes away
+
+    The client never sends after its request, so EOF (or a reset) means it exited or was
+    killed; the fit it asked for, cmdstan included, must not outlive it.
+    """
+    try:
+        while conn.recv(4096):
+            pass
+    except OSError:
+        pass
+    if not finished.is_set():
+        os.killpg(0, signal.SIGKILL)
+
+def handle_connection(conn):
+    """In a freshly forked child: adopt the client's stdio, cwd and environment, then run the detector"""
+    message, fds, _, _ = socket.recv_fds(conn, 65536, 3)
+    request = json.loads(read_line(conn, message))
+    for target, fd in enumerate(fds):
+        os.dup2(fd, target)
+        os.close(fd)
+    # Python's stdio objects were opened before dup2; rebuild them over the new descriptors
+    sys.stdin = open(0, 'r', encoding='utf-8', closefd=False)
+    sys.stdout = open(1, 'w', encoding='utf-8', closefd=False)
+    sys.stderr = open(2, 'w', encoding='utf-8', closefd=False)
+    os.chdir(request['cwd'])
+    os.environ.clear()
+    os.environ.update(request['env'])
+    
+    # Own process group, so cmdstan and pool processes die with this child
+    os.setpgid(0, 0)
+    finished = threading.Event()
+    threading.Thread(target=watch_client, args=(conn, finished), daemon=True).start()
+    
+    exit_code = run_detector(request['argv'], request['started_at'])
+    finished.set()
+    conn.sendall(json.dumps({'exit_code': exit_code}).encode('utf-8') + b'\n')
+
+def serve(path, idle_seconds):
+    """Preload the detector, then fork one warm child per connection until idle"""
+    lock_file = open(f"{path}.lock", 'w')
+    try:
+        fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except OSError:
+        return  # Another server already owns this socket
+    
+    sys.path.insert(0, DETECTOR_DIR)
+    import prophet_seasonal_detector as detector
+    detector.warm_up()
+    detector.IMPORT_SECONDS = 0.0  # Children never pay for the imports
+    
+    if os.path.exists(path):
+        os.unlink(path)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    previous_umask = os.umask(0o077)  # Socket file readable and writable by this user only
+    try:
+        server.bind(path)
+    finally:
+        os.umask(previous_umask)
+    server.listen(64)
+    server.settimeout(idle_seconds)
+    signal.signal(signal.SIGCHLD, signal.SIG_IGN)  # Let the kernel reap finished children
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))  # Still remove the socket
+    
+    try:
+        while True:
+            try:
+                conn, _ = server.accept()
+            except socket.timeout:
+                break
+            uid = peer_uid(conn)
+            if uid is not None and uid != os.getuid():
+                conn.close()  # Only serve the user who owns this server
+                continue
+            if os.fork() == 0:
+                # The detector waits on cmdstan and pool processes, so it needs normal child reaping
+                signal.signal(signal.SIGCHLD, signal.SIG_DFL)
+                signal.signal(signal.SIGTERM, signal.SIG_DFL)
+                server.close()
+                lock_file.close()
+                conn.settimeout(None)
+                try:
+                    handle_connection(conn)
+                finally:
+                    os._exit(0)
+            conn.close()
+    finally:
+        server.close()
+        os.unlink(path)
+
+def start_server(path):
+    """Start a detached server process for later requests"""
+    with open(os.devnull, 'wb') as devnull:
+        subprocess.Popen([sys.executable, os.path.abspath(__file__), '--serve'],
+                         stdin=subprocess.DEVNULL, stdout=devnull, stderr=devnull,
+                         start_new_session=True, cwd=DETECTOR_DIR)
+
+def forward_to_server(path, argv):
+    """Hand this process's stdio to the server; returns the child's exit code or None if unreachable"""
+    client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    try:
+        client.connect(path)
+    except OSError:
+        client.close()
+        return None
+    
+    # Never hand the environment and stdio to a listener run by someone else
+    uid = peer_uid(client)
+    if uid is None:
+        try:
+            uid = os.stat(path).st_uid
+        except OSError:
+            uid = None
+    if uid != os.getuid():
+        client.close()
+        print(f"Warning: ignoring fork server socket {path} not owned by this user", file=sys.stderr)
+        return None
+    
+    request = {'argv': argv, 'cwd': os.getcwd(), 'env': dict(os.environ), 'started_at': _CLIENT_STARTED}
+    with client:
+        try:
+            socket.send_fds(client, [json.dumps(request).encode('utf-8') + b'\n'], [0, 1, 2])
+            reply = read_line(client)
+        except OSError:
+            # E.g. the server hit its idle timeout between connect() and accept()
+            return None
+    return json.loads(reply)['exit_code'] if reply else CHILD_FAILED_EXIT_CODE
+
+def main():
+    argv = sys.argv[1:]
+    path = socket_path()
+    
+    if argv[:1] == ['--serve']:
+        serve(path, float(os.environ.get('PROPHET_FORKSERVER_IDLE_SECONDS', DEFAULT_IDLE_SECONDS)))
+        return
+    
+    if forking_supported() and path:
+        exit_code = forward_to_server(path, argv)
+        if exit_code is not None:
+            sys.exit(exit_code)
+        # No server yet: start one for the next request and answer this one ourselves
+        start_server(path)
+    
+    sys.exit(run_detector(argv, _CLIENT_STARTED))
+
+if __name__ == "__main__":
+    main()
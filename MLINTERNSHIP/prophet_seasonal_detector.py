@@ -1,124 +1,1647 @@
+import time
+_IMPORT_STARTED = time.perf_counter()
+
+import os
 import sys
 import json
+import argparse
+import struct
+import hashlib
+import socketserver
+import tracemalloc
+from collections import OrderedDict
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from concurrent.futures.process import BrokenProcessPool
 import pandas as pd
 import numpy as np
 from prophet import Prophet
+from prophet.serialize import model_to_json, model_from_json
 import warnings
 warnings.filterwarnings('ignore')
 
-def main():
-    try:
-        input_file_path = sys.argv[1]
-        with open(input_file_path, 'r', encoding='utf-8') as f:
-            input_data = json.load(f)
+# resource and fcntl are POSIX-only; RSS reporting and the metrics file are skipped without them
+try:
+    import resource
+except ImportError:
+    resource = None
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+# Time spent importing pandas/numpy/prophet when this process started
+IMPORT_SECONDS = time.perf_counter() - _IMPORT_STARTED
+
+SEASONAL_COMPONENTS = ['weekly', 'yearly', 'monthly', 'quarterly']
+
+# Enhanced Prophet model with more sophisticated seasonality detection
+PROPHET_CONFIG = {
+    'yearly_seasonality': True,
+    'weekly_seasonality': True,
+    'daily_seasonality': False,
+    'seasonality_mode': 'multiplicative',
+    'changepoint_prior_scale': 0.05,  # Reduce overfitting
+    'seasonality_prior_scale': 10.0,   # Allow stronger seasonality
+    'holidays_prior_scale': 10.0,      # Allow holiday effects
+    'interval_width': 0.8              # Confidence intervals
+}
+
+# Custom seasonalities for better detection
+CUSTOM_SEASONALITIES = [
+    {'name': 'monthly', 'period': 30.5, 'fourier_order': 5},
+    {'name': 'quarterly', 'period': 91.25, 'fourier_order': 3},
+]
+
+# Posterior draws per prediction when a payload asks for intervals; without intervals none are drawn
+DEFAULT_UNCERTAINTY_SAMPLES = 1000
+INTERVAL_COLUMNS = ['yhat', 'yhat_lower', 'yhat_upper']
+
+def requested_uncertainty_samples(input_data):
+    """Uncertainty samples to draw for a payload: 0 unless include_intervals is set"""
+    if not input_data.get('include_intervals'):
+        return 0
+    samples = int(input_data.get('uncertainty_samples', DEFAULT_UNCERTAINTY_SAMPLES))
+    if samples <= 0:
+        raise ValueError(f"include_intervals needs uncertainty_samples > 0 (got {samples})")
+    return samples
+
+def model_config(seasonalities=None, overrides=None):
+    """Everything that determines the fitted model apart from the series itself"""
+    return {
+        'prophet': dict(PROPHET_CONFIG, **(overrides or {})),
+        'seasonalities': CUSTOM_SEASONALITIES if seasonalities is None else seasonalities
+    }
+
+def build_prophet_model(seasonalities=None, overrides=None):
+    config = model_config(seasonalities, overrides)
+    m = Prophet(**config['prophet'])
+    for seasonality in config['seasonalities']:
+        m.add_seasonality(**seasonality)
+    return m
+
+# Cycles of history a seasonality needs before it can be identified
+SEASONALITY_MIN_CYCLES = 2.0
+# F statistic a Fourier block must reach on the detrended series to be kept (roughly the 1% level)
+SEASONALITY_MIN_F = 3.0
+
+def score_seasonalities(df):
+    """Strength of each candidate seasonality on the detrended, relative series
+
+    Each candidate's Fourier block is regressed alone on y / trend - 1; strength is
+    the variance it explains and f_stat the matching F statistic.
+    """
+    days = days_since_epoch(df['ds'].to_numpy(dtype='datetime64[ns]'))
+    y = df['y'].to_numpy(dtype=np.float64)
+    n_rows = len(y)
+    y_scale = max(np.abs(y).max(), 1e-9)
+    X_trend, trend_penalty = trend_design(days, n_rows)
+    trend = (X_trend @ ridge_solve(X_trend, y / y_scale, trend_penalty)) * y_scale
+    relative = y / np.where(np.abs(trend) < 1e-9, 1e-9, trend) - 1.0
+    relative = relative - relative.mean()
+    total = float(np.sum(relative ** 2))
+    span_days = days[-1] - days[0] + 1 if n_rows else 0.0
+    
+    scores = {}
+    for seasonality in FAST_ENGINE_SEASONALITIES:
+        n_features = 2 * seasonality['fourier_order']
+        if span_days < SEASONALITY_MIN_CYCLES * seasonality['period'] or n_rows <= n_features + 1 or total <= 0:
+            scores[seasonality['name']] = {'strength': 0.0, 'f_stat': 0.0, 'selected': False}
+            continue
+        X = fourier_features(days, seasonality['period'], seasonality['fourier_order'])
+        coef = np.linalg.lstsq(X, relative, rcond=None)[0]
+        strength = 1.0 - float(np.sum((relative - X @ coef) ** 2)) / total
+        f_stat = (strength / n_features) / max((1.0 - strength) / (n_rows - n_features - 1), 1e-12)
+        scores[seasonality['name']] = {
+            'strength': strength,
+            'f_stat': f_stat,
+            'selected': f_stat >= SEASONALITY_MIN_F
+        }
+    return scores
+
+# Rough cost of a full Prophet fit + predict, used to pick a degradation level up front
+PROPHET_BASE_SECONDS = 0.3
+PROPHET_SECONDS_PER_ROW = 0.001
+# Share of that cost spent in predict, which cannot be interrupted
+PROPHET_PREDICT_SHARE = 0.35
+# Time kept back for interpreter startup, extraction, serialization and process exit
+DEADLINE_RESERVE_SECONDS = 0.5
+# Optimizer iterations a cold fit on a full history typically needs
+TYPICAL_OPTIMIZER_ITERATIONS = 500
+MIN_OPTIMIZER_ITERATIONS = 50
+
+# Cheapest-last order; each level keeps the output schema unchanged
+DEGRADATION_LEVELS = ['none', 'capped_iterations', 'reduced_seasonalities', 'fast_engine']
+
+def plan_degradation(n_rows, deadline):
+    """Pick the least degraded fit expected to finish before the deadline
+
+    Returns the degradation level, an optimizer iteration cap (or None) and the
+    seconds the optimizer may run before it is stopped (or None without a deadline).
+    """
+    if deadline is None:
+        return 'none', None, None
+    
+    remaining = deadline - time.time() - DEADLINE_RESERVE_SECONDS
+    estimate = PROPHET_BASE_SECONDS + PROPHET_SECONDS_PER_ROW * n_rows
+    fit_timeout = remaining - PROPHET_PREDICT_SHARE * estimate
+    if remaining >= estimate:
+        return 'none', None, fit_timeout
+    
+    max_iterations = max(MIN_OPTIMIZER_ITERATIONS, int(TYPICAL_OPTIMIZER_ITERATIONS * remaining / estimate))
+    if remaining >= 0.6 * estimate:
+        return 'capped_iterations', max_iterations, fit_timeout
+    if remaining >= 0.3 * estimate:
+        return 'reduced_seasonalities', max_iterations, fit_timeout
+    return 'fast_engine', None, None
+
+# Rows that identify a series for warm starts when the caller gives no series_id
+LINEAGE_HEAD_ROWS = 28
+
+def changepoint_grid(m, df):
+    """Scaled changepoint positions Prophet will place when fitting m on df"""
+    n_rows = len(df)
+    hist_size = int(np.floor(n_rows * m.changepoint_range))
+    n_changepoints = min(m.n_changepoints, hist_size - 1)
+    if n_changepoints <= 0:
+        return np.array([0.0])  # Prophet's dummy changepoint
+    cp_indexes = np.linspace(0, hist_size - 1, n_changepoints + 1).round().astype(int)[1:]
+    ds = df['ds']
+    return ((ds.iloc[cp_indexes] - ds.iloc[0]) / (ds.iloc[-1] - ds.iloc[0])).to_numpy(dtype=np.float64)
+
+def warm_start_params(previous, m, df):
+    """Optimizer initial values from a previously fitted model, carried over to m's fit on df
+
+    Prophet optimizes in scaled space: t runs from 0 to 1 over the history, y is divided by
+    its absolute max and changepoints sit on a grid over the first changepoint_range of the
+    rows. Appending rows moves all three, so the previous trend is re-expressed on df's
+    scales and grid: its slope is read off at each new changepoint, and additive terms are
+    rescaled by the change in y scale. Multiplicative seasonality is scale-free.
+    """
+    y_scale = float(df['y'].abs().max()) or 1.0
+    y_ratio = previous.y_scale / y_scale
+    t_ratio = (df['ds'].iloc[-1] - df['ds'].iloc[0]) / previous.t_scale
+    
+    k = float(previous.params['k'][0][0])
+    delta = np.asarray(previous.params['delta'][0], dtype=np.float64)
+    old_changepoints = np.asarray(previous.changepoints_t, dtype=np.float64)
+    
+    # Previous trend slope at t = 0 and at every new changepoint, in the new scaled units
+    new_changepoints = changepoint_grid(m, df)
+    at = np.concatenate([[0.0], new_changepoints]) * t_ratio
+    slopes = np.array([k + delta[old_changepoints <= t].sum() for t in at]) * t_ratio * y_ratio
+    
+    beta = np.asarray(previous.params['beta'][0], dtype=np.float64)
+    component_cols = previous.train_component_cols
+    if component_cols is not None and 'additive_terms' in component_cols:
+        beta = beta * np.where(component_cols['additive_terms'].to_numpy() > 0, y_ratio, 1.0)
+    
+    return {
+        'k': slopes[0],
+        'm': float(previous.params['m'][0][0]) * y_ratio,
+        'sigma_obs': float(previous.params['sigma_obs'][0][0]) * y_ratio,
+        'delta': np.diff(slopes),
+        'beta': beta
+    }
+
+def optimizer_iterations(m):
+    """Optimizer iterations of the last fit; 0 when Prophet skipped Stan (constant y)"""
+    if m.stan_fit is None:
+        return 0
+    return int(m.stan_fit.optimized_iterations_np.shape[0])
+
+class ModelCache:
+    """On-disk cache of fitted Prophet models with size- and age-based LRU eviction"""
+    
+    def __init__(self, cache_dir, max_bytes, max_age_seconds):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        os.makedirs(cache_dir, exist_ok=True)
+    
+    @staticmethod
+    def make_key(df, config):
+        """Content hash of the (ds, y) series plus the model configuration"""
+        digest = hashlib.sha256()
+        digest.update(df['ds'].to_numpy(dtype='datetime64[ns]').view(np.int64).tobytes())
+        digest.update(df['y'].to_numpy(dtype=np.float64).tobytes())
+        digest.update(json.dumps(config, sort_keys=True).encode('utf-8'))
+        return digest.hexdigest()
+    
+    @staticmethod
+    def make_lineage_key(df, config, series_id=None):
+        """Identity of a series that survives appending new rows to it"""
+        digest = hashlib.sha256(json.dumps(config, sort_keys=True).encode('utf-8'))
+        if series_id is not None:
+            digest.update(f'series_id:{series_id}'.encode('utf-8'))
+        else:
+            # Without an explicit id, the first rows of the series identify it
+            head = df.iloc[:LINEAGE_HEAD_ROWS]
+            digest.update(head['ds'].to_numpy(dtype='datetime64[ns]').view(np.int64).tobytes())
+            digest.update(head['y'].to_numpy(dtype=np.float64).tobytes())
+        return digest.hexdigest()
+    
+    def _path(self, key):
+        return os.path.join(self.cache_dir, f'{key}.json')
+    
+    def _lineage_path(self, lineage_key):
+        return os.path.join(self.cache_dir, f'{lineage_key}.lineage.json')
+    
+    def put_lineage(self, lineage_key, record):
+        """Remember the latest fitted model for a series so later extensions can warm-start"""
+        path = self._lineage_path(lineage_key)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(record, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Warning: could not record series lineage {lineage_key}: {str(e)}", file=sys.stderr)
+            self._remove(tmp_path)
+    
+    def find_previous_fit(self, lineage_key, df, config):
+        """Previously fitted model whose series is a strict prefix of df, with its lineage record"""
+        try:
+            with open(self._lineage_path(lineage_key), 'r', encoding='utf-8') as f:
+                record = json.load(f)
+        except (OSError, ValueError):
+            return None, None
         
-        historical_data = input_data['historical_data']
-        horizon = input_data.get('horizon', 7)  # Get forecast horizon
+        n_rows = record.get('n_rows', 0)
+        if not 0 < n_rows < len(df):
+            return None, None
+        # Only a true extension qualifies: the old rows must be unchanged
+        if ModelCache.make_key(df.iloc[:n_rows], config) != record.get('model_key'):
+            return None, None
         
-        df = pd.DataFrame(historical_data)
-        df['ds'] = pd.to_datetime(df['ds'])
-        df = df.sort_values('ds').reset_index(drop=True)
+        previous_model = self.get(record['model_key'])
+        if previous_model is None:
+            return None, None
+        return previous_model, record
+    
+    def _remove(self, path):
+        try:
+            os.unlink(path)
+        except FileNotFoundError:
+            pass
+    
+    def get(self, key):
+        path = self._path(key)
+        try:
+            if time.time() - os.path.getmtime(path) > self.max_age_seconds:
+                self._remove(path)
+                return None
+            with open(path, 'r', encoding='utf-8') as f:
+                model = model_from_json(f.read())
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError) as e:
+            # A truncated or stale-format entry is treated as a miss and dropped
+            print(f"Warning: discarding unreadable cached model {key}: {str(e)}", file=sys.stderr)
+            self._remove(path)
+            return None
         
-        # Enhanced Prophet model with more sophisticated seasonality detection
-        m = Prophet(
-            yearly_seasonality=True,
-            weekly_seasonality=True,
-            daily_seasonality=False,
-            seasonality_mode='multiplicative',
-            changepoint_prior_scale=0.05,  # Reduce overfitting
-            seasonality_prior_scale=10.0,   # Allow stronger seasonality
-            holidays_prior_scale=10.0,      # Allow holiday effects
-            interval_width=0.8              # Confidence intervals
+        try:
+            os.utime(path)  # Refresh recency for LRU eviction
+        except FileNotFoundError:
+            pass  # Evicted by another process after the read; the loaded model is still good
+        return model
+    
+    def put(self, key, model):
+        path = self._path(key)
+        tmp_path = f'{path}.{os.getpid()}.tmp'
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write(model_to_json(model))
+            os.replace(tmp_path, path)  # Atomic so concurrent readers never see partial files
+        except OSError as e:
+            print(f"Warning: could not cache fitted model {key}: {str(e)}", file=sys.stderr)
+            self._remove(tmp_path)
+            return
+        self.evict()
+    
+    def evict(self):
+        """Drop expired entries, then least recently used ones until under the size limit"""
+        now = time.time()
+        entries = []
+        for entry in os.scandir(self.cache_dir):
+            if not entry.name.endswith('.json'):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            if now - stat.st_mtime > self.max_age_seconds:
+                self._remove(entry.path)
+            else:
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        
+        total_bytes = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total_bytes <= self.max_bytes:
+                break
+            self._remove(path)
+            total_bytes -= size
+
+_model_cache = None
+
+def get_model_cache():
+    """Model cache configured from the environment, or None when caching is disabled"""
+    global _model_cache
+    cache_dir = os.environ.get('PROPHET_MODEL_CACHE_DIR')
+    if not cache_dir:
+        return None
+    if _model_cache is None or _model_cache.cache_dir != cache_dir:
+        _model_cache = ModelCache(
+            cache_dir,
+            max_bytes=float(os.environ.get('PROPHET_MODEL_CACHE_MAX_MB', 512)) * 1024 * 1024,
+            max_age_seconds=float(os.environ.get('PROPHET_MODEL_CACHE_MAX_AGE_HOURS', 24)) * 3600
         )
+    return _model_cache
+
+def array_nbytes(value):
+    """Bytes held by the arrays and frames inside a (possibly nested) cached value"""
+    if isinstance(value, np.ndarray):
+        return value.nbytes
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return int(value.memory_usage(index=True, deep=False).sum())
+    if isinstance(value, (list, tuple)):
+        return sum(array_nbytes(v) for v in value)
+    if isinstance(value, dict):
+        return sum(array_nbytes(v) for v in value.values())
+    return 0
+
+class DesignCache:
+    """In-process LRU of date-derived design matrices and future frames, bounded by array bytes
+
+    SKUs in one run usually share their date range and horizon, so batch workers and the
+    resident worker build the seasonal features once and only pay for the per-SKU solves.
+    Cached values are shared between fits and must be treated as read-only.
+    """
+    
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.entries = OrderedDict()
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+    
+    @staticmethod
+    def make_key(kind, dates, params):
+        digest = hashlib.sha256(np.ascontiguousarray(dates, dtype='datetime64[ns]').view(np.int64).tobytes())
+        digest.update(json.dumps(params, sort_keys=True, default=str).encode('utf-8'))
+        return kind, digest.hexdigest()
+    
+    def get_or_build(self, key, build):
+        if key in self.entries:
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return self.entries[key][0]
         
-        # Add custom seasonalities for better detection
-        m.add_seasonality(name='monthly', period=30.5, fourier_order=5)
-        m.add_seasonality(name='quarterly', period=91.25, fourier_order=3)
+        self.misses += 1
+        value = build()
+        nbytes = array_nbytes(value)
+        if nbytes <= self.max_bytes:
+            self.entries[key] = (value, nbytes)
+            self.total_bytes += nbytes
+            while self.total_bytes > self.max_bytes:
+                _, (_, evicted_bytes) = self.entries.popitem(last=False)
+                self.total_bytes -= evicted_bytes
+        return value
+
+_design_cache = None
+
+def get_design_cache():
+    """Design cache sized from the environment; a size of 0 disables it"""
+    global _design_cache
+    max_bytes = float(os.environ.get('PROPHET_DESIGN_CACHE_MAX_MB', 64)) * 1024 * 1024
+    if _design_cache is None or _design_cache.max_bytes != max_bytes:
+        _design_cache = DesignCache(max_bytes)
+    return _design_cache
+
+def share_design_features(m):
+    """Route a Prophet model's seasonal feature construction through the design cache
+
+    Only plain date-driven seasonalities are shared; holidays, regressors and conditional
+    seasonalities depend on more than ds and are always rebuilt.
+    """
+    build_features = m.make_all_seasonality_features
+    
+    def make_all_seasonality_features(df):
+        if (m.holidays is not None or m.country_holidays is not None or m.extra_regressors
+                or any(props['condition_name'] is not None for props in m.seasonalities.values())):
+            return build_features(df)
+        key = DesignCache.make_key('prophet_features', df['ds'].to_numpy(dtype='datetime64[ns]'), m.seasonalities)
+        features, prior_scales, component_cols, modes = get_design_cache().get_or_build(
+            key, lambda: build_features(df))
+        # Prophet keeps the scales and modes on the model; hand each fit its own lists
+        return features, list(prior_scales), component_cols, {mode: list(names) for mode, names in modes.items()}
+    
+    m.make_all_seasonality_features = make_all_seasonality_features
+    return m
+
+def future_frame(history_dates, horizon):
+    """History plus daily horizon dates for predict, shared across series with the same dates
+
+    Matches Prophet's make_future_dataframe, but the history can be wider than the fitted window.
+    """
+    dates = np.unique(history_dates.to_numpy(dtype='datetime64[ns]'))
+    
+    def build():
+        future_dates = dates[-1] + np.arange(1, horizon + 1) * np.timedelta64(1, 'D')
+        return pd.DataFrame({'ds': np.concatenate([dates, future_dates])})
+    
+    return get_design_cache().get_or_build(DesignCache.make_key('future_frame', dates, horizon), build)
+
+# Fourier orders Prophet uses for yearly/weekly when enabled, plus the custom seasonalities
+FAST_ENGINE_SEASONALITIES = [
+    {'name': 'yearly', 'period': 365.25, 'fourier_order': 10},
+    {'name': 'weekly', 'period': 7, 'fourier_order': 3},
+] + CUSTOM_SEASONALITIES
+
+# Prophet's default changepoint grid: 25 changepoints over the first 80% of history
+FAST_ENGINE_N_CHANGEPOINTS = 25
+FAST_ENGINE_CHANGEPOINT_RANGE = 0.8
+
+# Ridge penalties on the max-scaled series. Yearly harmonics and the quarterly/monthly terms are
+# nearly collinear on short histories, so these are much stronger than Prophet's priors imply;
+# they were tuned to track the Prophet engine's components on supply_chain_data.csv
+FAST_ENGINE_CHANGEPOINT_PENALTY = 100.0
+FAST_ENGINE_SEASONAL_PENALTY = 3.0
+
+# Alternating trend/seasonality refinements for the multiplicative fit
+FAST_ENGINE_REFINEMENTS = 2
+
+def fourier_features(days, period, fourier_order):
+    """sin/cos columns for one seasonality, matching Prophet's layout"""
+    angles = 2.0 * np.pi * np.outer(days / period, np.arange(1, fourier_order + 1))
+    return np.column_stack([np.sin(angles), np.cos(angles)])
+
+def trend_features(t, changepoints):
+    """Piecewise-linear trend basis: offset, slope and one hinge per changepoint"""
+    return np.column_stack([np.ones_like(t), t, np.maximum(0.0, t[:, None] - changepoints[None, :])])
+
+def days_since_epoch(dates):
+    return (dates - np.datetime64('1970-01-01', 'ns')) / np.timedelta64(1, 'D')
+
+def trend_design(days, n_history):
+    """Piecewise-linear trend basis over history plus horizon, with its ridge penalties
+
+    Time is scaled to [0, 1] over the history and changepoints follow Prophet's grid.
+    """
+    span = max(days[n_history - 1] - days[0], 1.0)
+    t = (days - days[0]) / span
+    n_changepoints = min(FAST_ENGINE_N_CHANGEPOINTS, max(0, int(FAST_ENGINE_CHANGEPOINT_RANGE * n_history) - 1))
+    changepoints = np.linspace(0, FAST_ENGINE_CHANGEPOINT_RANGE, n_changepoints + 2)[1:-1]
+    
+    # Offset and base slope are unpenalized; changepoint deltas are shrunk
+    penalty = np.concatenate([[0.0, 0.0], np.full(n_changepoints, FAST_ENGINE_CHANGEPOINT_PENALTY)])
+    return trend_features(t, changepoints), penalty
+
+def ridge_solve(X, y, penalties):
+    """Least squares with a per-column L2 penalty"""
+    return np.linalg.solve(X.T @ X + np.diag(penalties), X.T @ y)
+
+def run_fast_engine(df, horizon, timer=None):
+    """Piecewise-linear trend plus Fourier seasonality fitted by regularized least squares"""
+    timer = timer or StageTimer()
+    
+    with timer.stage('fit'):
+        history_dates = df['ds'].to_numpy(dtype='datetime64[ns]')
+        future_dates = history_dates[-1] + np.arange(1, horizon + 1) * np.timedelta64(1, 'D')
+        all_dates = np.concatenate([history_dates, future_dates])
+        n_history = len(history_dates)
         
-        # Fit the model
-        m.fit(df)
+        # Same value scaling Prophet applies before fitting
+        y = df['y'].to_numpy(dtype=np.float64)
+        y_scale = max(np.abs(y).max(), 1e-9)
+        y_scaled = y / y_scale
         
-        # Create future dataframe for forecasting
-        future = m.make_future_dataframe(periods=horizon)
-        forecast = m.predict(future)
+        # The design depends only on the dates, so SKUs sharing a date range share it
+        def build_design():
+            days = days_since_epoch(all_dates)
+            X_trend, trend_penalty = trend_design(days, n_history)
+            blocks = [fourier_features(days, s['period'], s['fourier_order']) for s in FAST_ENGINE_SEASONALITIES]
+            return X_trend, trend_penalty, blocks, np.column_stack(blocks)
         
-        # Extract detailed seasonal components for historical data
-        historical_seasonal_spikes = {}
-        historical_weekly_seasonality = {}
-        historical_yearly_seasonality = {}
-        historical_monthly_seasonality = {}
-        historical_quarterly_seasonality = {}
+        design_key = DesignCache.make_key('fast_design', all_dates, [
+            n_history, FAST_ENGINE_SEASONALITIES, FAST_ENGINE_CHANGEPOINT_PENALTY])
+        X_trend, trend_penalty, blocks, X_seasonal = get_design_cache().get_or_build(design_key, build_design)
+        n_changepoints = X_trend.shape[1] - 2
+        seasonal_penalty = np.full(X_seasonal.shape[1], FAST_ENGINE_SEASONAL_PENALTY)
         
-        for i, row in df.iterrows():
-            baseline = max(forecast.loc[i, 'trend'], 0.1)  # Prevent division by zero
-            
-            # Extract different seasonal components
-            weekly_seasonal = forecast.loc[i, 'weekly'] if 'weekly' in forecast.columns else 0
-            yearly_seasonal = forecast.loc[i, 'yearly'] if 'yearly' in forecast.columns else 0
-            monthly_seasonal = forecast.loc[i, 'monthly'] if 'monthly' in forecast.columns else 0
-            quarterly_seasonal = forecast.loc[i, 'quarterly'] if 'quarterly' in forecast.columns else 0
-            
-            # Calculate combined seasonal effect
-            seasonal_effect = weekly_seasonal + yearly_seasonal + monthly_seasonal + quarterly_seasonal
-            
-            # Calculate spike multiplier with more sophisticated logic
-            spike_multiplier = max(0.5, min(3.0, 1.0 + (seasonal_effect / baseline)))
-            
-            date_str = row['ds'].strftime('%Y-%m-%d')
-            historical_seasonal_spikes[date_str] = float(spike_multiplier)
-            historical_weekly_seasonality[date_str] = float(weekly_seasonal)
-            historical_yearly_seasonality[date_str] = float(yearly_seasonal)
-            historical_monthly_seasonality[date_str] = float(monthly_seasonal)
-            historical_quarterly_seasonality[date_str] = float(quarterly_seasonal)
-        
-        # Extract seasonal multipliers for future dates
-        future_seasonal_spikes = []
-        future_weekly_seasonality = []
-        future_yearly_seasonality = []
-        future_monthly_seasonality = []
-        future_quarterly_seasonality = []
-        
-        for i in range(len(df), len(forecast)):
-            baseline = max(forecast.loc[i, 'trend'], 0.1)
+        # Multiplicative model y = trend * (1 + seasonal), fitted by alternating two linear problems
+        seasonal_fit = np.zeros(n_history)
+        for _ in range(FAST_ENGINE_REFINEMENTS):
+            trend_coef = ridge_solve(X_trend[:n_history], y_scaled / (1.0 + seasonal_fit), trend_penalty)
+            trend_fit = X_trend[:n_history] @ trend_coef
+            safe_trend = np.where(np.abs(trend_fit) < 1e-9, 1e-9, trend_fit)
+            seasonal_coef = ridge_solve(X_seasonal[:n_history], y_scaled / safe_trend - 1.0, seasonal_penalty)
+            seasonal_fit = X_seasonal[:n_history] @ seasonal_coef
+    
+    with timer.stage('predict'):
+        forecast = {'trend': (X_trend @ trend_coef) * y_scale}
+        offset = 0
+        for seasonality, block in zip(FAST_ENGINE_SEASONALITIES, blocks):
+            width = block.shape[1]
+            forecast[seasonality['name']] = block @ seasonal_coef[offset:offset + width]
+            offset += width
+    
+    model_info = {
+        'engine': 'fast',
+        'changepoint_penalty': FAST_ENGINE_CHANGEPOINT_PENALTY,
+        'seasonal_penalty': FAST_ENGINE_SEASONAL_PENALTY,
+        'seasonality_mode': PROPHET_CONFIG['seasonality_mode'],
+        'n_changepoints': n_changepoints
+    }
+    return forecast, model_info
+
+# Forecast columns read downstream; everything else Prophet predicts is dropped right after predict
+FORECAST_COLUMNS = ['trend'] + SEASONAL_COMPONENTS + INTERVAL_COLUMNS
+
+def compact_forecast(forecast):
+    """The needed forecast columns as float32 arrays, so the wide float64 frame can be freed"""
+    return {name: np.asarray(forecast[name], dtype=np.float32) for name in FORECAST_COLUMNS if name in forecast}
+
+def extract_seasonal_components(forecast):
+    """Seasonal components and clipped spike multipliers (float32) for every forecast row
+
+    forecast is a Prophet forecast frame or any mapping of column name to array.
+    """
+    # len() of a mapping counts its columns, so take the row count from the trend array
+    n_rows = len(np.asarray(forecast['trend']))
+    components = {}
+    for name in SEASONAL_COMPONENTS:
+        if name in forecast:
+            components[name] = np.asarray(forecast[name], dtype=np.float32)
+        else:
+            components[name] = np.zeros(n_rows, dtype=np.float32)
+    
+    baseline = np.maximum(np.asarray(forecast['trend'], dtype=np.float32), 0.1)  # Prevent division by zero
+    
+    # Calculate combined seasonal effect
+    seasonal_effect = components['weekly'] + components['yearly'] + components['monthly'] + components['quarterly']
+    
+    # fmin/fmax treat NaN the same way the scalar min()/max() clipping does
+    components['spikes'] = np.fmax(0.5, np.fmin(3.0, 1.0 + (seasonal_effect / baseline)))
+    return components
+
+def build_result(history_dates, components, n_history, model_info):
+    """Assemble the detector JSON schema from per-row component arrays"""
+    date_strings = history_dates.dt.strftime('%Y-%m-%d').tolist()
+    
+    def historical(name):
+        return dict(zip(date_strings, components[name][:n_history].tolist()))
+    
+    def future(name):
+        return components[name][n_history:].tolist()
+    
+    # Return comprehensive seasonal patterns
+    return {
+        'historical_seasonal_spikes': historical('spikes'),
+        'future_seasonal_spikes': future('spikes'),
+        'historical_weekly_seasonality': historical('weekly'),
+        'future_weekly_seasonality': future('weekly'),
+        'historical_yearly_seasonality': historical('yearly'),
+        'future_yearly_seasonality': future('yearly'),
+        'historical_monthly_seasonality': historical('monthly'),
+        'future_monthly_seasonality': future('monthly'),
+        'historical_quarterly_seasonality': historical('quarterly'),
+        'future_quarterly_seasonality': future('quarterly'),
+        'seasonality_detected': True,
+        'model_info': model_info
+    }
+
+def current_rss_mb():
+    """Resident set size right now, or None where /proc is unavailable"""
+    try:
+        with open('/proc/self/statm', 'r') as f:
+            resident_pages = int(f.read().split()[1])
+        return round(resident_pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024), 2)
+    except (OSError, ValueError, AttributeError):
+        return None
+
+def peak_rss_mb():
+    """Peak resident set size of this process so far, or None where it cannot be measured"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is bytes on macOS and kilobytes on Linux
+    divisor = 1024 * 1024 if sys.platform == 'darwin' else 1024
+    return round(peak / divisor, 2)
+
+class StageTimer:
+    """Wall time, current RSS and process peak RSS recorded for each detector stage"""
+    
+    def __init__(self):
+        self.stages = {}
+        self.rss_start_mb = current_rss_mb()
+    
+    @contextmanager
+    def stage(self, name):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = {
+                'seconds': round(time.perf_counter() - started, 6),
+                'rss_mb': current_rss_mb(),
+                'peak_rss_mb': peak_rss_mb()
+            }
+    
+    def memory_summary(self):
+        """RSS when the series started, the highest RSS seen at a stage boundary, and the growth between them
+
+        The process peak is a high-water mark over every series a long-lived worker
+        has served; the stage samples show what this series needed.
+        """
+        samples = [t['rss_mb'] for t in self.stages.values() if t.get('rss_mb') is not None]
+        if self.rss_start_mb is None or not samples:
+            return {'process_peak_rss_mb': peak_rss_mb()}
+        return {
+            'rss_start_mb': self.rss_start_mb,
+            'rss_high_mb': max(samples),
+            'rss_growth_mb': round(max(samples) - self.rss_start_mb, 2),
+            'process_peak_rss_mb': peak_rss_mb()
+        }
+
+# Histogram buckets (seconds) for per-stage timings in the Prometheus textfile
+STAGE_SECONDS_BUCKETS = [0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0]
+
+def record_metrics(result=None, error=False, serialize_seconds=None, import_seconds=None):
+    """Fold one request into the Prometheus textfile named by $PROPHET_METRICS_FILE
+
+    The textfile collector reads whole files, so cumulative state is kept in a JSON
+    sidecar and the .prom file is rewritten atomically under an exclusive lock.
+    """
+    metrics_path = os.environ.get('PROPHET_METRICS_FILE')
+    if not metrics_path or fcntl is None:
+        return
+    
+    try:
+        with open(f'{metrics_path}.lock', 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            state_path = f'{metrics_path}.state.json'
+            try:
+                with open(state_path, 'r', encoding='utf-8') as f:
+                    state = json.load(f)
+            except (OSError, ValueError):
+                state = {'counters': {}, 'stages': {}, 'peak_rss_mb': 0.0}
             
-            weekly_seasonal = forecast.loc[i, 'weekly'] if 'weekly' in forecast.columns else 0
-            yearly_seasonal = forecast.loc[i, 'yearly'] if 'yearly' in forecast.columns else 0
-            monthly_seasonal = forecast.loc[i, 'monthly'] if 'monthly' in forecast.columns else 0
-            quarterly_seasonal = forecast.loc[i, 'quarterly'] if 'quarterly' in forecast.columns else 0
+            update_metrics_state(state, result, error, serialize_seconds, import_seconds)
             
-            seasonal_effect = weekly_seasonal + yearly_seasonal + monthly_seasonal + quarterly_seasonal
-            spike_multiplier = max(0.5, min(3.0, 1.0 + (seasonal_effect / baseline)))
+            for path, content in [(state_path, json.dumps(state)), (metrics_path, render_metrics(state))]:
+                tmp_path = f'{path}.{os.getpid()}.tmp'
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    f.write(content)
+                os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"Warning: could not update metrics file {metrics_path}: {str(e)}", file=sys.stderr)
+
+def update_metrics_state(state, result, error, serialize_seconds, import_seconds):
+    counters = state['counters']
+    
+    def increment(name, amount=1):
+        counters[name] = counters.get(name, 0) + amount
+    
+    def observe(stage, seconds):
+        histogram = state['stages'].setdefault(
+            stage, {'buckets': [0] * len(STAGE_SECONDS_BUCKETS), 'sum': 0.0, 'count': 0})
+        for i, upper_bound in enumerate(STAGE_SECONDS_BUCKETS):
+            if seconds <= upper_bound:
+                histogram['buckets'][i] += 1
+        histogram['sum'] += seconds
+        histogram['count'] += 1
+    
+    if import_seconds is not None:
+        observe('imports', import_seconds)
+    if error:
+        increment('prophet_detector_errors_total')
+        return
+    
+    model_info = result.get('model_info', {})
+    engine = model_info.get('engine', 'prophet')
+    if model_info.get('model_cache') == 'hit':
+        increment('prophet_detector_cache_hits_total')
+    else:
+        increment(f'prophet_detector_fits_total{{engine="{engine}"}}')
+    if model_info.get('fallback'):
+        increment(f'prophet_detector_fallbacks_total{{reason="{model_info["fallback"]}"}}')
+    
+    for stage, timing in model_info.get('stage_timings', {}).items():
+        observe(stage, timing['seconds'])
+        if timing.get('peak_rss_mb') is not None:
+            state['peak_rss_mb'] = max(state['peak_rss_mb'], timing['peak_rss_mb'])
+    if serialize_seconds is not None:
+        observe('serialize', serialize_seconds)
+
+def render_metrics(state):
+    """Prometheus text exposition of the cumulative metrics state"""
+    lines = [
+        '# HELP prophet_detector_stage_seconds Wall time spent in each detector stage',
+        '# TYPE prophet_detector_stage_seconds histogram'
+    ]
+    for stage, histogram in sorted(state['stages'].items()):
+        for upper_bound, count in zip(STAGE_SECONDS_BUCKETS, histogram['buckets']):
+            lines.append(f'prophet_detector_stage_seconds_bucket{{stage="{stage}",le="{upper_bound}"}} {count}')
+        lines.append(f'prophet_detector_stage_seconds_bucket{{stage="{stage}",le="+Inf"}} {histogram["count"]}')
+        lines.append(f'prophet_detector_stage_seconds_sum{{stage="{stage}"}} {histogram["sum"]}')
+        lines.append(f'prophet_detector_stage_seconds_count{{stage="{stage}"}} {histogram["count"]}')
+    
+    counter_help = {
+        'prophet_detector_fits_total': 'Series fitted, by engine',
+        'prophet_detector_cache_hits_total': 'Series served from the fitted-model cache',
+        'prophet_detector_fallbacks_total': 'Series that fell back to a cheaper fit, by reason',
+        'prophet_detector_errors_total': 'Requests that failed'
+    }
+    for name, help_text in counter_help.items():
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} counter')
+        series = {key: value for key, value in state['counters'].items() if key.split('{')[0] == name}
+        for key, value in sorted(series.items()) or [(name, 0)]:
+            lines.append(f'{key} {value}')
+    
+    lines.append('# HELP prophet_detector_peak_rss_bytes Highest peak RSS observed in any detector process')
+    lines.append('# TYPE prophet_detector_peak_rss_bytes gauge')
+    lines.append(f'prophet_detector_peak_rss_bytes {int(state["peak_rss_mb"] * 1024 * 1024)}')
+    return '\n'.join(lines) + '\n'
+
+# Component arrays in compact/binary output, in block order
+COMPACT_COMPONENTS = ['spikes'] + SEASONAL_COMPONENTS
+
+BINARY_MAGIC = b'PSD1'
+
+def build_compact_result(history_dates, components, n_history, model_info):
+    """Columnar result: one start date plus a frequency and aligned arrays covering history then horizon"""
+    dates = history_dates.to_numpy(dtype='datetime64[D]')
+    n_rows = len(components['spikes'])
+    result = {
+        'format': 'compact',
+        'start': str(dates[0]),
+        'freq': 'D',
+        'n_history': n_history,
+        'horizon': n_rows - n_history,
+        'components': {name: components[name].tolist() for name in COMPACT_COMPONENTS},
+        'seasonality_detected': True,
+        'model_info': model_info
+    }
+    # Gappy histories cannot be described by start + freq alone
+    if n_history > 1 and np.any(np.diff(dates) != np.timedelta64(1, 'D')):
+        result['history_dates'] = [str(d) for d in dates]
+    return result
+
+def encode_binary_result(compact_result):
+    """Binary layout: magic, uint32 header length, JSON header, then one little-endian float32 block per component"""
+    header = {key: value for key, value in compact_result.items() if key != 'components'}
+    header['format'] = 'binary'
+    header['dtype'] = '<f4'
+    header['components'] = COMPACT_COMPONENTS
+    header_bytes = json.dumps(header).encode('utf-8')
+    blocks = [np.asarray(compact_result['components'][name], dtype='<f4').tobytes() for name in COMPACT_COMPONENTS]
+    return BINARY_MAGIC + struct.pack('<I', len(header_bytes)) + header_bytes + b''.join(blocks)
+
+def prepare_history(input_data):
+    """Build the sorted (ds, y) frame from a row-wise or columnar payload
+
+    Row-wise payloads carry historical_data as [{ds, y}, ...]; columnar payloads carry a
+    start date plus a y array (and optionally a pandas freq, daily by default).
+    """
+    if 'historical_data' in input_data:
+        df = pd.DataFrame(input_data['historical_data'])
+        df['ds'] = pd.to_datetime(df['ds'])
+        df = df.sort_values('ds').reset_index(drop=True)
+        return df
+    
+    if 'start' in input_data and 'y' in input_data:
+        y = np.asarray(input_data['y'], dtype=np.float64)
+        ds = pd.date_range(start=input_data['start'], periods=len(y), freq=input_data.get('freq', 'D'))
+        return pd.DataFrame({'ds': ds, 'y': y})
+    
+    raise ValueError("Payload needs either historical_data or a columnar start/y pair")
+
+# History policies bound fit cost on long series; components are still predicted for every input date.
+# 'cap' fits on the most recent max_years; 'aggregate' fits yearly/quarterly on weekly means of the
+# full history and weekly/monthly on the last daily_window_days of daily data
+HISTORY_POLICIES = ['full', 'cap', 'aggregate']
+DEFAULT_MAX_HISTORY_YEARS = 3.0
+DEFAULT_DAILY_WINDOW_DAYS = 365
+
+def resolve_history_policy(input_data):
+    """Normalize the payload's history_policy (a mode name or a dict) into a full policy dict"""
+    policy = input_data.get('history_policy') or 'full'
+    if isinstance(policy, str):
+        policy = {'mode': policy}
+    mode = policy.get('mode', 'full')
+    if mode not in HISTORY_POLICIES:
+        raise ValueError(f"Unknown history_policy mode '{mode}' (expected one of {HISTORY_POLICIES})")
+    return {
+        'mode': mode,
+        'max_years': float(policy.get('max_years', DEFAULT_MAX_HISTORY_YEARS)),
+        'daily_window_days': int(policy.get('daily_window_days', DEFAULT_DAILY_WINDOW_DAYS))
+    }
+
+def recent_window(df, days):
+    """Rows of df within the last `days` days of its history"""
+    return df[df['ds'] > df['ds'].iloc[-1] - pd.Timedelta(days=days)].reset_index(drop=True)
+
+def weekly_means(df):
+    """Weekly mean demand, dated at the middle of each Monday-Sunday week"""
+    weekly = df.set_index('ds')['y'].resample('W').mean().dropna().reset_index()
+    weekly['ds'] = weekly['ds'] - pd.Timedelta(days=3)
+    return weekly
+
+def run_aggregated_prophet_engine(df, horizon, policy, seasonalities, overrides, timer, deadline):
+    """Two small Prophet fits instead of one long one
+
+    Trend, yearly and quarterly come from weekly means over the full history; weekly and
+    monthly (too fast for weekly sampling) come from the recent daily window, fitted on
+    demand with the slow seasonality divided out. Not cached or warm-started.
+    """
+    overrides = overrides or {}
+    custom = CUSTOM_SEASONALITIES if seasonalities is None else seasonalities
+    with timer.stage('aggregate'):
+        weekly_df = weekly_means(df)
+        daily_df = recent_window(df, policy['daily_window_days'])
+    
+    degradation, max_iterations, fit_timeout = plan_degradation(len(weekly_df) + len(daily_df), deadline)
+    if degradation == 'fast_engine':
+        return run_degraded_fast_engine(df, horizon, timer, degradation)
+    fit_kwargs = {}
+    if max_iterations is not None:
+        fit_kwargs['iter'] = max_iterations
+    if fit_timeout is not None:
+        fit_kwargs['timeout'] = max(fit_timeout / 2, 0.01)
+    
+    future = future_frame(df['ds'], horizon)
+    # reduced_seasonalities drops the custom monthly/quarterly terms, as in the single fit
+    if degradation == 'reduced_seasonalities':
+        custom = []
+    slow_model = share_design_features(build_prophet_model(
+        [s for s in custom if s['name'] == 'quarterly'],
+        {**overrides, 'weekly_seasonality': False}))
+    fast_model = share_design_features(build_prophet_model(
+        [s for s in custom if s['name'] == 'monthly'],
+        {**overrides, 'yearly_seasonality': False}))
+    try:
+        with timer.stage('fit'):
+            slow_model.fit(weekly_df, **fit_kwargs)
+            slow_model.uncertainty_samples = 0
+            slow_frame = slow_model.predict(future)
+            slow_effect = slow_frame['multiplicative_terms'].to_numpy(dtype=np.float64)
+            slow_forecast = compact_forecast(slow_frame)
+            del slow_frame
             
-            future_seasonal_spikes.append(float(spike_multiplier))
-            future_weekly_seasonality.append(float(weekly_seasonal))
-            future_yearly_seasonality.append(float(yearly_seasonal))
-            future_monthly_seasonality.append(float(monthly_seasonal))
-            future_quarterly_seasonality.append(float(quarterly_seasonal))
-        
-        # Return comprehensive seasonal patterns
-        result = {
-            'historical_seasonal_spikes': historical_seasonal_spikes,
-            'future_seasonal_spikes': future_seasonal_spikes,
-            'historical_weekly_seasonality': historical_weekly_seasonality,
-            'future_weekly_seasonality': future_weekly_seasonality,
-            'historical_yearly_seasonality': historical_yearly_seasonality,
-            'future_yearly_seasonality': future_yearly_seasonality,
-            'historical_monthly_seasonality': historical_monthly_seasonality,
-            'future_monthly_seasonality': future_monthly_seasonality,
-            'historical_quarterly_seasonality': historical_quarterly_seasonality,
-            'future_quarterly_seasonality': future_quarterly_seasonality,
-            'seasonality_detected': True,
-            'model_info': {
-                'changepoint_prior_scale': 0.05,
-                'seasonality_prior_scale': 10.0,
-                'holidays_prior_scale': 10.0,
-                'seasonality_mode': 'multiplicative'
-            }
+            # Divide the slow seasonality out of the window so the daily fit only sees the fast part
+            window_effect = slow_effect[len(df) - len(daily_df):len(df)]
+            daily_df = daily_df.assign(y=daily_df['y'] / np.maximum(1.0 + window_effect, 0.1))
+            fast_model.fit(daily_df, **fit_kwargs)
+    except TimeoutError:
+        return run_degraded_fast_engine(df, horizon, timer, 'fast_engine')
+    
+    with timer.stage('predict'):
+        fast_model.uncertainty_samples = 0
+        fast_forecast = compact_forecast(fast_model.predict(future))
+        forecast = {'trend': slow_forecast['trend']}
+        for name in SEASONAL_COMPONENTS:
+            source = slow_forecast if name in slow_forecast else fast_forecast
+            if name in source:
+                forecast[name] = source[name]
+    
+    model_info = {
+        'engine': 'prophet',
+        'changepoint_prior_scale': PROPHET_CONFIG['changepoint_prior_scale'],
+        'seasonality_prior_scale': PROPHET_CONFIG['seasonality_prior_scale'],
+        'holidays_prior_scale': PROPHET_CONFIG['holidays_prior_scale'],
+        'seasonality_mode': PROPHET_CONFIG['seasonality_mode'],
+        'model_cache': 'skipped',
+        'uncertainty_samples': 0,
+        'history_policy': policy,
+        'fit_rows': {'weekly_aggregated': len(weekly_df), 'daily_window': len(daily_df)}
+    }
+    if deadline is not None:
+        model_info['degradation'] = degradation
+        if degradation != 'none':
+            model_info['fallback'] = degradation
+    return forecast, model_info
+
+def run_degraded_fast_engine(df, horizon, timer, degradation):
+    """Answer with the NumPy engine when the deadline leaves no room for Prophet"""
+    forecast, model_info = run_fast_engine(df, horizon, timer)
+    model_info['degradation'] = degradation
+    model_info['fallback'] = degradation
+    return forecast, model_info
+
+def run_prophet_engine(df, horizon, input_data, timer=None, deadline=None):
+    """Fit (or reuse) a Prophet model and predict history plus horizon
+
+    With a deadline (epoch seconds), a cache miss is fitted at the least degraded
+    level expected to fit the remaining budget, and an optimizer that overruns it
+    is stopped and replaced by the fast engine.
+    """
+    timer = timer or StageTimer()
+    
+    # Opt-in pruning of seasonalities that carry no signal; pruned components come out as zeros
+    seasonalities, overrides, selection = None, None, None
+    if input_data.get('auto_seasonality'):
+        with timer.stage('seasonality_selection'):
+            selection = score_seasonalities(df)
+        seasonalities = [s for s in CUSTOM_SEASONALITIES if selection[s['name']]['selected']]
+        overrides = {
+            'yearly_seasonality': selection['yearly']['selected'],
+            'weekly_seasonality': selection['weekly']['selected']
         }
+    
+    # Long histories can be fitted on a recent window or on aggregated data
+    policy = resolve_history_policy(input_data)
+    if policy['mode'] == 'aggregate':
+        forecast, model_info = run_aggregated_prophet_engine(
+            df, horizon, policy, seasonalities, overrides, timer, deadline)
+        if selection is not None:
+            model_info['seasonality_selection'] = selection
+        return forecast, model_info
+    fit_df = recent_window(df, policy['max_years'] * 365.25) if policy['mode'] == 'cap' else df
+    
+    # Reuse a previously fitted model when the same series and configuration were seen before
+    model_cache = get_model_cache()
+    config = model_config(seasonalities, overrides)
+    cache_status = 'disabled'
+    warm_start_info = {'warm_start': False}
+    m = None
+    if model_cache is not None:
+        with timer.stage('cache_lookup'):
+            cache_key = ModelCache.make_key(fit_df, config)
+            m = model_cache.get(cache_key)
+        cache_status = 'hit' if m is not None else 'miss'
+        if m is not None:
+            share_design_features(m)
+    
+    degradation = 'none'
+    if m is None:
+        degradation, max_iterations, fit_timeout = plan_degradation(len(fit_df), deadline)
+        if degradation == 'fast_engine':
+            return run_degraded_fast_engine(df, horizon, timer, degradation)
+        
+        # Degraded fits are neither cached nor used as warm-start lineage
+        cacheable = model_cache is not None and degradation == 'none'
+        m = share_design_features(
+            build_prophet_model([] if degradation == 'reduced_seasonalities' else seasonalities, overrides))
+        fit_kwargs = {}
+        if max_iterations is not None:
+            fit_kwargs['iter'] = max_iterations
+        if fit_timeout is not None:
+            fit_kwargs['timeout'] = max(fit_timeout, 0.01)
+        previous_record = None
+        if cacheable:
+            lineage_key = ModelCache.make_lineage_key(fit_df, config, input_data.get('series_id'))
+            previous_model, previous_record = model_cache.find_previous_fit(lineage_key, fit_df, config)
+            fit_kwargs['save_iterations'] = True  # Needed to count optimizer iterations
+            if previous_model is not None:
+                # New history extends a known series: start the optimizer from its parameters
+                fit_kwargs['init'] = warm_start_params(previous_model, m, fit_df)
+        
+        # Fit the model
+        try:
+            with timer.stage('fit'):
+                m.fit(fit_df, **fit_kwargs)
+        except TimeoutError:
+            return run_degraded_fast_engine(df, horizon, timer, 'fast_engine')
+        
+        if cacheable:
+            iterations = optimizer_iterations(m)
+            warm_started = 'init' in fit_kwargs
+            if warm_started:
+                cold_iterations = previous_record['cold_iterations']
+                cold_rows = previous_record.get('cold_rows')
+            else:
+                cold_iterations, cold_rows = iterations, len(fit_df)
+            warm_start_info = {
+                'warm_start': warm_started,
+                'optimizer_iterations': iterations
+            }
+            if warm_started:
+                # The last cold fit of this series was on fewer rows, so it is a reference, not a saving
+                warm_start_info['reference_cold_fit'] = {'optimizer_iterations': cold_iterations, 'rows': cold_rows}
+            model_cache.put(cache_key, m)
+            model_cache.put_lineage(lineage_key, {
+                'model_key': cache_key,
+                'n_rows': len(fit_df),
+                'cold_iterations': cold_iterations,
+                'cold_rows': cold_rows
+            })
+    
+    # Components are deterministic, so sampling is skipped for them; intervals, when requested,
+    # are sampled over the horizon rows only
+    samples = requested_uncertainty_samples(input_data)
+    with timer.stage('predict'):
+        future = future_frame(df['ds'], horizon)
+        m.uncertainty_samples = 0
+        forecast = compact_forecast(m.predict(future))
+        if samples:
+            n_history = len(future) - horizon
+            m.uncertainty_samples = samples
+            horizon_forecast = compact_forecast(m.predict(future.iloc[n_history:]))
+            for column in INTERVAL_COLUMNS:
+                forecast[column] = np.concatenate([np.full(n_history, np.nan, dtype=np.float32), horizon_forecast[column]])
+    
+    model_info = {
+        'engine': 'prophet',
+        'changepoint_prior_scale': PROPHET_CONFIG['changepoint_prior_scale'],
+        'seasonality_prior_scale': PROPHET_CONFIG['seasonality_prior_scale'],
+        'holidays_prior_scale': PROPHET_CONFIG['holidays_prior_scale'],
+        'seasonality_mode': PROPHET_CONFIG['seasonality_mode'],
+        'model_cache': cache_status,
+        'uncertainty_samples': samples,
+        **warm_start_info
+    }
+    if policy['mode'] == 'cap':
+        model_info['history_policy'] = policy
+        model_info['fit_rows'] = len(fit_df)
+    if selection is not None:
+        model_info['seasonality_selection'] = selection
+    if deadline is not None:
+        model_info['degradation'] = degradation
+        if degradation != 'none':
+            model_info['fallback'] = degradation
+    return forecast, model_info
+
+def component_deviation(components, reference):
+    """Per-component mean and max absolute difference between two engines' outputs"""
+    deviation = {}
+    for name in SEASONAL_COMPONENTS + ['spikes']:
+        diff = np.abs(components[name] - reference[name])
+        deviation[name] = {'mae': float(diff.mean()), 'max_abs': float(diff.max())}
+    return deviation
+
+def assemble_result(input_data, df, components, model_info):
+    """Build the result in the output format the payload asked for"""
+    if input_data.get('output_format', 'json') == 'compact':
+        return build_compact_result(df['ds'], components, len(df), model_info)
+    return build_result(df['ds'], components, len(df), model_info)
+
+def detect_seasonality(input_data, started_at=None):
+    """Fit one series payload with the selected engine and return its seasonal components
+
+    started_at (epoch seconds) is when the caller's clock for deadline_ms started;
+    it defaults to now.
+    """
+    horizon = input_data.get('horizon', 7)  # Get forecast horizon
+    engine = input_data.get('engine', 'prophet')
+    timer = StageTimer()
+    
+    # Reject unusable interval settings before any engine pays for a fit
+    requested_uncertainty_samples(input_data)
+    
+    # Exact peak of Python/NumPy allocations for this series, at some cost in speed
+    trace_memory = bool(input_data.get('trace_memory')) and not tracemalloc.is_tracing()
+    if trace_memory:
+        tracemalloc.start()
+    
+    deadline = None
+    if input_data.get('deadline_ms') is not None:
+        deadline = (started_at or time.time()) + input_data['deadline_ms'] / 1000.0
+    
+    with timer.stage('dataframe'):
+        df = prepare_history(input_data)
+    
+    if engine == 'prophet':
+        forecast, model_info = run_prophet_engine(df, horizon, input_data, timer, deadline)
+    elif engine == 'fast':
+        forecast, model_info = run_fast_engine(df, horizon, timer)
+    else:
+        raise ValueError(f"Unknown engine '{engine}' (expected 'prophet' or 'fast')")
+    
+    # Extract seasonal components for historical and future dates in whole-column operations
+    with timer.stage('extract'):
+        components = extract_seasonal_components(forecast)
+        intervals = None
+        if 'yhat_lower' in forecast:
+            intervals = {column: np.asarray(forecast[column])[len(df):] for column in INTERVAL_COLUMNS}
+        del forecast
+    
+    if deadline is not None:
+        model_info['deadline_ms'] = input_data['deadline_ms']
+    
+    if input_data.get('compare_engines'):
+        # Fit the other engine too and report how far the components drift apart
+        if engine == 'prophet':
+            reference, _ = run_fast_engine(df, horizon)
+        else:
+            reference, _ = run_prophet_engine(df, horizon, input_data)
+        model_info['engine_deviation'] = component_deviation(components, extract_seasonal_components(reference))
+    
+    # Serialization happens in the caller, so its timing only reaches the metrics file
+    model_info['stage_timings'] = timer.stages
+    model_info['import_seconds'] = round(IMPORT_SECONDS, 6)
+    with timer.stage('assemble'):
+        result = assemble_result(input_data, df, components, model_info)
+        if input_data.get('include_intervals'):
+            if intervals is not None:
+                result['future_intervals'] = {column: values.tolist() for column, values in intervals.items()}
+            elif model_info.get('history_policy', {}).get('mode') == 'aggregate':
+                print("Warning: the aggregate history policy does not produce intervals", file=sys.stderr)
+            else:
+                print(f"Warning: the {model_info['engine']} engine does not produce intervals", file=sys.stderr)
+    
+    # The result holds model_info by reference, so the summary still covers the assemble stage
+    model_info['memory'] = timer.memory_summary()
+    if trace_memory:
+        model_info['memory']['traced_peak_mb'] = round(tracemalloc.get_traced_memory()[1] / (1024 * 1024), 2)
+        tracemalloc.stop()
+    return result
+
+def default_pool_size():
+    """Size the batch pool to the machine; each cmdstan optimizer is single-threaded"""
+    return max(1, os.cpu_count() or 1)
+
+def run_isolated(func, jobs, max_workers=None):
+    """Run func(*args) for every {key: args} job in a bounded process pool
+
+    A job that raises only marks its own key as failed with {'error': ...}. A worker that
+    dies (OOM kill, segfault) breaks the whole pool, so the keys it left unfinished are
+    rerun one process each and only a key that kills its worker again fails.
+    """
+    max_workers = min(max_workers or default_pool_size(), max(1, len(jobs)))
+    results = {}
+    
+    if max_workers == 1:
+        for key, args in jobs.items():
+            try:
+                results[key] = func(*args)
+            except Exception as e:
+                results[key] = {'error': str(e)}
+        return results
+    
+    unfinished = []
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = {}
+        for key, args in jobs.items():
+            try:
+                futures[key] = executor.submit(func, *args)
+            except BrokenProcessPool:
+                unfinished.append(key)
+        for key, future in futures.items():
+            try:
+                results[key] = future.result()
+            except BrokenProcessPool:
+                unfinished.append(key)
+            except Exception as e:
+                results[key] = {'error': str(e)}
+    
+    if unfinished:
+        print(f"Warning: a worker process died; rerunning {len(unfinished)} unfinished jobs one per process",
+              file=sys.stderr)
+        results.update(run_each_in_own_process(func, {key: jobs[key] for key in unfinished}, max_workers))
+    return {key: results[key] for key in jobs}
+
+def run_each_in_own_process(func, jobs, max_workers):
+    """Run every job in a one-process pool of its own, max_workers at a time, so a dying worker fails only its key"""
+    results = {}
+    queued = list(jobs.items())
+    running = {}  # Future -> (key, its executor)
+    while queued or running:
+        while queued and len(running) < max_workers:
+            key, args = queued.pop(0)
+            executor = ProcessPoolExecutor(max_workers=1)
+            running[executor.submit(func, *args)] = (key, executor)
+        done, _ = wait(running, return_when=FIRST_COMPLETED)
+        for future in done:
+            key, executor = running.pop(future)
+            executor.shutdown()
+            try:
+                results[key] = future.result()
+            except BrokenProcessPool as e:
+                results[key] = {'error': f"Worker process died: {str(e)}"}
+            except Exception as e:
+                results[key] = {'error': str(e)}
+    return results
+
+def detect_seasonality_batch(batch_data, max_workers=None, started_at=None, pooled=False):
+    """Fit every series in a {sku: payload} batch and return results keyed by SKU
+
+    Per-SKU deadline_ms budgets all count from the start of the batch. With pooled=True,
+    SKUs carrying a category share one seasonal fit per category.
+    """
+    started_at = started_at or time.time()
+    if not isinstance(batch_data, dict):
+        raise ValueError("Batch input must be an object of {sku: payload}")
+    
+    if pooled:
+        return detect_seasonality_pooled(batch_data, max_workers, started_at)
+    return run_isolated(detect_seasonality, {sku: (payload, started_at) for sku, payload in batch_data.items()},
+                        max_workers)
+
+# A SKU whose pooled seasonal shape explains no more variance than its trend alone should get its own model
+POOLED_MIN_SEASONAL_GAIN = 0.0
+
+def aggregate_normalized_demand(histories):
+    """Mean of each SKU's demand divided by its own mean level, per date"""
+    frames = []
+    for df in histories:
+        level = df['y'].mean()
+        frames.append(pd.DataFrame({'ds': df['ds'], 'y': df['y'] / (level if level else 1.0)}))
+    return pd.concat(frames).groupby('ds', as_index=False)['y'].mean()
+
+def fit_category_seasonality(aggregated, horizon, deadline=None):
+    """Fit Prophet once on a category's normalized demand and keep only its seasonal components"""
+    forecast, model_info = run_prophet_engine(aggregated, horizon, {}, deadline=deadline)
+    dates = pd.DatetimeIndex(future_frame(aggregated['ds'], horizon)['ds'], name='ds')
+    components = pd.DataFrame({name: forecast[name] for name in SEASONAL_COMPONENTS if name in forecast}, index=dates)
+    return {'components': components, 'model_info': model_info}
+
+def smape_terms(y, yhat):
+    """Per-point symmetric absolute percentage error (0 where both values are 0)"""
+    denominator = np.abs(y) + np.abs(yhat)
+    return np.where(denominator > 0, 2.0 * np.abs(y - yhat) / np.where(denominator > 0, denominator, 1.0), 0.0)
+
+def pooled_fit_quality(y, fitted, trend_only_fitted):
+    """Residual fit of a SKU against its category's shared seasonal shape"""
+    sse = float(np.sum((y - fitted) ** 2))
+    sst = float(np.sum((y - y.mean()) ** 2))
+    sse_trend_only = float(np.sum((y - trend_only_fitted) ** 2))
+    smape = smape_terms(y, fitted)
+    seasonal_gain = 1.0 - sse / sse_trend_only if sse_trend_only > 0 else 0.0
+    return {
+        'r2': 1.0 - sse / sst if sst > 0 else 0.0,
+        'smape': float(smape.mean() * 100),
+        # Share of the trend-only residual variance the pooled seasonality removes
+        'seasonal_gain': seasonal_gain,
+        'recommend_own_model': seasonal_gain <= POOLED_MIN_SEASONAL_GAIN
+    }
+
+def fit_pooled_sku(payload, df, category, category_size, category_fit):
+    """Fit one SKU's own trend/scale against its category's seasonal components"""
+    horizon = payload.get('horizon', 7)
+    timer = StageTimer()
+    
+    with timer.stage('fit'):
+        n_history = len(df)
+        history_dates = df['ds'].to_numpy(dtype='datetime64[ns]')
+        all_dates = np.concatenate([
+            history_dates, history_dates[-1] + np.arange(1, horizon + 1) * np.timedelta64(1, 'D')])
+        
+        pooled = category_fit['components'].reindex(pd.DatetimeIndex(all_dates)).fillna(0.0)
+        forecast = {}
+        for name in SEASONAL_COMPONENTS:
+            forecast[name] = pooled[name].to_numpy(dtype=np.float64) if name in pooled else np.zeros(len(all_dates))
+        seasonal_effect = forecast['weekly'] + forecast['yearly'] + forecast['monthly'] + forecast['quarterly']
+        
+        y = df['y'].to_numpy(dtype=np.float64)
+        y_scale = max(np.abs(y).max(), 1e-9)
+        X_trend, trend_penalty = get_design_cache().get_or_build(
+            DesignCache.make_key('trend_design', all_dates, [n_history, FAST_ENGINE_CHANGEPOINT_PENALTY]),
+            lambda: trend_design(days_since_epoch(all_dates), n_history))
+        
+        # y = trend * (1 + seasonal) is linear in the trend coefficients once seasonal is fixed
+        X_history = X_trend[:n_history] * (1.0 + seasonal_effect[:n_history])[:, None]
+        trend_coef = ridge_solve(X_history, y / y_scale, trend_penalty)
+        forecast['trend'] = (X_trend @ trend_coef) * y_scale
+        fitted = forecast['trend'][:n_history] * (1.0 + seasonal_effect[:n_history])
+        
+        trend_only_coef = ridge_solve(X_trend[:n_history], y / y_scale, trend_penalty)
+        trend_only_fitted = (X_trend[:n_history] @ trend_only_coef) * y_scale
+    
+    with timer.stage('extract'):
+        components = extract_seasonal_components(forecast)
+    
+    model_info = {
+        'engine': 'pooled',
+        'category': category,
+        'category_size': category_size,
+        'category_model': category_fit['model_info'],
+        'pooled_fit': pooled_fit_quality(y, fitted, trend_only_fitted),
+        'stage_timings': timer.stages,
+        'import_seconds': round(IMPORT_SECONDS, 6)
+    }
+    if payload.get('deadline_ms') is not None:
+        model_info['deadline_ms'] = payload['deadline_ms']
+    with timer.stage('assemble'):
+        result = assemble_result(payload, df, components, model_info)
+    model_info['memory'] = timer.memory_summary()
+    return result
+
+def needs_own_model(payload):
+    """True when a payload asks for an engine, history policy or intervals a shared category fit cannot give it"""
+    return (payload.get('engine', 'prophet') != 'prophet'
+            or resolve_history_policy(payload)['mode'] != 'full'
+            or bool(payload.get('include_intervals')))
+
+def detect_seasonality_pooled(batch_data, max_workers=None, started_at=None):
+    """Fit seasonal components once per category, then only a trend/scale per SKU
+
+    SKUs without a category, whose payload needs_own_model, or whose category fit fails
+    get their own model. A category fit runs within the tightest deadline_ms of its SKUs.
+    """
+    results = {}
+    histories = {}
+    categories = {}
+    individual_jobs = {}
+    horizon_ends = {}
+    deadlines = {}
+    for sku, payload in batch_data.items():
+        # A malformed payload only fails its own SKU, as it would in a non-pooled batch
+        try:
+            category = payload.get('category')
+            if category is None or needs_own_model(payload):
+                individual_jobs[sku] = (payload, started_at)
+                continue
+            histories[sku] = prepare_history(payload)
+            horizon_ends[sku] = histories[sku]['ds'].iloc[-1] + pd.Timedelta(days=payload.get('horizon', 7))
+            if payload.get('deadline_ms') is not None:
+                deadlines[sku] = started_at + payload['deadline_ms'] / 1000.0
+            categories.setdefault(category, []).append(sku)
+        except Exception as e:
+            histories.pop(sku, None)
+            results[sku] = {'error': str(e)}
+    
+    category_jobs = {}
+    for category, skus in categories.items():
+        aggregated = aggregate_normalized_demand([histories[sku] for sku in skus])
+        # The shared future must reach the furthest horizon of any member SKU
+        furthest = max(horizon_ends[sku] for sku in skus)
+        horizon = max(0, (furthest - aggregated['ds'].iloc[-1]).days)
+        member_deadlines = [deadlines[sku] for sku in skus if sku in deadlines]
+        category_jobs[category] = (aggregated, horizon, min(member_deadlines) if member_deadlines else None)
+    
+    category_fits = run_isolated(fit_category_seasonality, category_jobs, max_workers)
+    for category, category_fit in category_fits.items():
+        if 'error' in category_fit:
+            for sku in categories.pop(category):
+                individual_jobs[sku] = (batch_data[sku], started_at)
+    
+    results.update(run_isolated(detect_seasonality, individual_jobs, max_workers))
+    
+    for category, skus in categories.items():
+        for sku in skus:
+            try:
+                results[sku] = fit_pooled_sku(batch_data[sku], histories[sku], category, len(skus),
+                                              category_fits[category])
+            except Exception as e:
+                results[sku] = {'error': str(e)}
+    return results
+
+# Prophet settings a backtest may override when tuning
+BACKTEST_TUNABLE_PARAMS = ['changepoint_prior_scale', 'seasonality_prior_scale']
+BACKTEST_DEFAULT_CUTOFFS = 5
+BACKTEST_MIN_TRAIN_ROWS = 60
+
+def build_tuned_model(params):
+    """Prophet model with backtest overrides for prior scales and custom Fourier orders
+
+    A Fourier order of 0 drops that custom seasonality.
+    """
+    overrides = {name: params[name] for name in BACKTEST_TUNABLE_PARAMS if name in params}
+    overrides['uncertainty_samples'] = 0  # Only yhat is scored
+    
+    fourier_orders = params.get('fourier_orders', {})
+    seasonalities = [
+        dict(seasonality, fourier_order=fourier_orders.get(seasonality['name'], seasonality['fourier_order']))
+        for seasonality in CUSTOM_SEASONALITIES
+    ]
+    # Same construction as production fits, so backtests cannot drift from them
+    return build_prophet_model([s for s in seasonalities if s['fourier_order'] > 0], overrides)
+
+def backtest_cutoff(df, cutoff, horizon, params):
+    """Fit on history up to the cutoff and score yhat on the following horizon rows"""
+    train = df[df['ds'] <= cutoff]
+    test = df[df['ds'] > cutoff].iloc[:horizon]
+    if len(train) < BACKTEST_MIN_TRAIN_ROWS:
+        raise ValueError(f"Only {len(train)} training rows before cutoff (need {BACKTEST_MIN_TRAIN_ROWS})")
+    if test.empty:
+        raise ValueError("No observations after cutoff")
+    
+    m = build_tuned_model(params)
+    m.fit(train)
+    yhat = m.predict(test[['ds']])['yhat'].to_numpy(dtype=np.float64)
+    y = test['y'].to_numpy(dtype=np.float64)
+    return {
+        'n_train': len(train),
+        'steps': ((test['ds'] - cutoff) / pd.Timedelta(days=1)).astype(int).tolist(),
+        'abs_error': np.abs(y - yhat).tolist(),
+        'smape': (smape_terms(y, yhat) * 100).tolist()
+    }
+
+def default_backtest_cutoffs(df, horizon, n_cutoffs):
+    """Non-overlapping origins stepping back one horizon at a time from the end of history"""
+    last = df['ds'].iloc[-1]
+    return [last - pd.Timedelta(days=horizon * i) for i in range(n_cutoffs, 0, -1)]
+
+def run_backtest(input_data, max_workers=None):
+    """Rolling-origin backtest across cutoffs in a process pool, scored per cutoff and per horizon step"""
+    df = prepare_history(input_data)
+    horizon = input_data.get('horizon', 7)
+    params = input_data.get('params', {})
+    if 'cutoffs' in input_data:
+        cutoffs = [pd.Timestamp(cutoff) for cutoff in input_data['cutoffs']]
+    else:
+        cutoffs = default_backtest_cutoffs(df, horizon, input_data.get('n_cutoffs', BACKTEST_DEFAULT_CUTOFFS))
+    
+    # Pool processes fork from this one, so they inherit the imports and the loaded Stan model
+    warm_up()
+    jobs = {cutoff.strftime('%Y-%m-%d'): (df, cutoff, horizon, params) for cutoff in cutoffs}
+    outcomes = run_isolated(backtest_cutoff, jobs, max_workers)
+    
+    per_cutoff = []
+    per_step = {}
+    errors = {}
+    for cutoff, outcome in outcomes.items():
+        if 'error' in outcome:
+            errors[cutoff] = outcome['error']
+            continue
+        per_cutoff.append([cutoff, outcome['n_train'], float(np.mean(outcome['abs_error'])),
+                           float(np.mean(outcome['smape']))])
+        for step, abs_error, smape in zip(outcome['steps'], outcome['abs_error'], outcome['smape']):
+            per_step.setdefault(step, ([], []))
+            per_step[step][0].append(abs_error)
+            per_step[step][1].append(smape)
+    
+    all_abs_errors = [e for abs_errors, _ in per_step.values() for e in abs_errors]
+    all_smapes = [e for _, smapes in per_step.values() for e in smapes]
+    return {
+        'horizon': horizon,
+        'params': params,
+        'per_cutoff': {
+            'columns': ['cutoff', 'n_train', 'mae', 'smape'],
+            'rows': per_cutoff
+        },
+        'per_step': {
+            'columns': ['step', 'mae', 'smape', 'n'],
+            'rows': [[step, float(np.mean(abs_errors)), float(np.mean(smapes)), len(abs_errors)]
+                     for step, (abs_errors, smapes) in sorted(per_step.items())]
+        },
+        'overall': {
+            'mae': float(np.mean(all_abs_errors)) if all_abs_errors else None,
+            'smape': float(np.mean(all_smapes)) if all_smapes else None
+        },
+        'errors': errors
+    }
+
+def handle_request_line(line):
+    """Process one newline-delimited JSON request and return the JSON response line"""
+    try:
+        request = json.loads(line)
+    except ValueError as e:
+        return json.dumps({'error': f"Invalid JSON request: {str(e)}"})
+    
+    try:
+        response = detect_seasonality(request)
+    except Exception as e:
+        response = {'error': str(e)}
+    
+    # Echo the caller's correlation id so responses can be matched to requests
+    if isinstance(request, dict) and 'id' in request:
+        response['id'] = request['id']
+    
+    started = time.perf_counter()
+    response_line = json.dumps(response)
+    record_metrics(response, error='error' in response, serialize_seconds=time.perf_counter() - started)
+    return response_line
+
+def warm_up():
+    """Load the compiled Stan model once so the first request does not pay for it"""
+    Prophet()
+
+def run_worker(stream_in, stream_out):
+    """Serve newline-delimited JSON requests until the input stream is closed"""
+    for line in stream_in:
+        if not line.strip():
+            continue
+        stream_out.write(handle_request_line(line) + '\n')
+        stream_out.flush()
+
+class WorkerRequestHandler(socketserver.StreamRequestHandler):
+    """Serve newline-delimited JSON requests over one Unix socket connection"""
+    
+    def handle(self):
+        for raw_line in self.rfile:
+            line = raw_line.decode('utf-8')
+            if not line.strip():
+                continue
+            self.wfile.write((handle_request_line(line) + '\n').encode('utf-8'))
+            self.wfile.flush()
+
+def serve_unix_socket(socket_path):
+    """Serve worker requests on a local Unix socket, one connection at a time"""
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    with socketserver.UnixStreamServer(socket_path, WorkerRequestHandler) as server:
+        try:
+            server.serve_forever()
+        finally:
+            os.unlink(socket_path)
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description='Prophet seasonal spike detector')
+    parser.add_argument('input_file', nargs='?', default='-',
+                        help='Path to the JSON payload file, or - (the default) to read it from stdin')
+    parser.add_argument('--worker', action='store_true',
+                        help='Stay resident and serve newline-delimited JSON requests')
+    parser.add_argument('--socket', help='Unix socket path to listen on in worker mode (default: stdin/stdout)')
+    parser.add_argument('--batch', action='store_true',
+                        help='Treat the input as {sku: payload} and return results keyed by SKU')
+    parser.add_argument('--pooled', action='store_true',
+                        help='In batch mode, fit seasonality once per payload category and only a trend per SKU')
+    parser.add_argument('--backtest', action='store_true',
+                        help='Run a rolling-origin backtest: payload adds cutoffs (or n_cutoffs) and optional params')
+    parser.add_argument('--max-workers', type=int, default=None,
+                        help='Process pool size for batch and backtest modes (default: CPU count)')
+    parser.add_argument('--cache-dir',
+                        help='Directory for cached fitted models (default: $PROPHET_MODEL_CACHE_DIR, disabled if unset)')
+    parser.add_argument('--cache-max-mb', type=float,
+                        help='Evict least recently used models above this total size (default: 512)')
+    parser.add_argument('--cache-max-age-hours', type=float,
+                        help='Evict cached models older than this (default: 24)')
+    parser.add_argument('--design-cache-max-mb', type=float,
+                        help='Memory bound for seasonal design matrices shared across SKUs with the same dates '
+                             '(default: 64, 0 disables)')
+    parser.add_argument('--format', choices=['json', 'compact', 'binary'],
+                        help='Output format; compact and binary emit one start date plus aligned component arrays')
+    parser.add_argument('--output', help='Write the result to this path instead of stdout')
+    parser.add_argument('--metrics-file',
+                        help='Prometheus textfile-collector file to update with stage timings and counters '
+                             '(default: $PROPHET_METRICS_FILE, disabled if unset)')
+    return parser.parse_args(argv)
+
+def write_output(result, output_format, output_path):
+    """Write a result to stdout or a file, encoding binary output when requested"""
+    if output_format == 'binary':
+        payload = encode_binary_result(result)
+    else:
+        payload = json.dumps(result).encode('utf-8')
+    
+    if output_path:
+        with open(output_path, 'wb') as f:
+            f.write(payload)
+    elif output_format == 'binary':
+        sys.stdout.buffer.write(payload)
+        sys.stdout.buffer.flush()
+    else:
+        print(payload.decode('utf-8'))
+
+def main():
+    args = parse_args(sys.argv[1:])
+    
+    # Settings travel through the environment so batch pool processes pick them up too
+    if args.cache_dir:
+        os.environ['PROPHET_MODEL_CACHE_DIR'] = args.cache_dir
+    if args.cache_max_mb is not None:
+        os.environ['PROPHET_MODEL_CACHE_MAX_MB'] = str(args.cache_max_mb)
+    if args.cache_max_age_hours is not None:
+        os.environ['PROPHET_MODEL_CACHE_MAX_AGE_HOURS'] = str(args.cache_max_age_hours)
+    if args.design_cache_max_mb is not None:
+        os.environ['PROPHET_DESIGN_CACHE_MAX_MB'] = str(args.design_cache_max_mb)
+    if args.metrics_file:
+        os.environ['PROPHET_METRICS_FILE'] = args.metrics_file
+    
+    if args.worker:
+        # Keep pandas/prophet imports and the Stan model warm across requests
+        warm_up()
+        if args.socket:
+            serve_unix_socket(args.socket)
+        else:
+            run_worker(sys.stdin, sys.stdout)
+        return
+    
+    try:
+        if args.input_file == '-':
+            input_data = json.load(sys.stdin)
+        else:
+            with open(args.input_file, 'r', encoding='utf-8') as f:
+                input_data = json.load(f)
+        
+        if args.batch and args.format == 'binary':
+            raise ValueError("Binary output is only available for single-series requests")
+        if args.pooled and not args.batch:
+            raise ValueError("--pooled requires --batch")
+        if args.backtest and args.format not in (None, 'json'):
+            raise ValueError("Backtest results are only available as JSON")
+        if args.format:
+            # The command-line format overrides whatever the payload asked for
+            payloads = input_data.values() if args.batch else [input_data]
+            for payload in payloads:
+                payload['output_format'] = 'json' if args.format == 'json' else 'compact'
+        
+        # The caller's timeout started with this process, before the imports
+        process_started_at = time.time() - (time.perf_counter() - _IMPORT_STARTED)
+        if args.backtest:
+            result = run_backtest(input_data, args.max_workers)
+        elif args.batch:
+            result = detect_seasonality_batch(input_data, args.max_workers, process_started_at, args.pooled)
+        else:
+            result = detect_seasonality(input_data, process_started_at)
+        
+        started = time.perf_counter()
+        write_output(result, args.format, args.output)
+        serialize_seconds = time.perf_counter() - started
         
-        print(json.dumps(result))
+        if args.batch:
+            for sku_result in result.values():
+                record_metrics(sku_result, error='error' in sku_result)
+        elif not args.backtest:
+            # A single-shot process pays the imports once per request
+            record_metrics(result, serialize_seconds=serialize_seconds, import_seconds=IMPORT_SECONDS)
         
     except Exception as e:
+        record_metrics(error=True)
         print(f"Error: {str(e)}", file=sys.stderr)
         sys.exit(1)
 
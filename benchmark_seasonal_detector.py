@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+Benchmark harness for the Prophet seasonal detector.
+
+Generates synthetic SKU series with sccc2.py, runs them through the detector in its
+different invocation modes and engines, and writes a machine-readable JSON report
+that can be compared against a stored baseline.
+"""
+
+import io
+import os
+import sys
+import json
+import math
+import random
+import argparse
+import platform
+import subprocess
+import contextlib
+from time import perf_counter
+from typing import Dict, List, Tuple
+
+import sccc2
+
+DETECTOR_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'MLINTERNSHIP', 'prophet_seasonal_detector.py')
+
+MODES = ['single', 'worker', 'batch']
+ENGINES = ['prophet', 'fast']
+
+def generate_series(series_length: int, sku_count: int, seed: int) -> Dict[str, List[Dict]]:
+    """Generate {sku: [{ds, y}, ...]} with the sccc2.py demand model"""
+    random.seed(seed)
+    sccc2.NUM_SKUS = sku_count
+    sccc2.ENTRIES_PER_SKU = series_length
+
+    # The generator narrates its progress; keep the benchmark output clean
+    with contextlib.redirect_stdout(io.StringIO()):
+        rows = sccc2.generate_enhanced_data()
+
+    series = {}
+    for row in rows:
+        series.setdefault(row[2], []).append({'ds': row[0], 'y': row[5]})
+    return series
+
+def load_series(path: str, series_length: int, sku_count: int) -> Dict[str, List[Dict]]:
+    """Take {sku: [{ds, y}, ...]} from a file written by sccc2.py, reading only the columns needed
+
+    Uses the first sku_count SKUs and the first series_length days of each.
+    """
+    columns = sccc2.load_columnar(path, ['Date', 'SKU', 'Number of products sold'])
+    dates = columns['Date'].astype('datetime64[D]').astype(str)
+
+    series = {}
+    for ds, sku, y in zip(dates.tolist(), columns['SKU'].tolist(), columns['Number of products sold'].tolist()):
+        rows = series.get(sku)
+        if rows is None:
+            if len(series) == sku_count:
+                break
+            rows = series[sku] = []
+        if len(rows) < series_length:
+            rows.append({'ds': ds, 'y': y})
+    return series
+
+def percentile(values: List[float], pct: float) -> float:
+    """Nearest-rank percentile"""
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100.0 * len(ordered)))
+    return ordered[rank - 1]
+
+def result_peak_rss_mb(result: Dict) -> float:
+    timings = result.get('model_info', {}).get('stage_timings', {})
+    peaks = [t['peak_rss_mb'] for t in timings.values() if t.get('peak_rss_mb') is not None]
+    return max(peaks, default=0.0)
+
+def run_single(payloads: Dict[str, Dict], python: str) -> Tuple[List[float], List[Dict]]:
+    """One detector process per SKU, payload piped over stdin (the C# caller's pattern)"""
+    latencies, results = [], []
+    for payload in payloads.values():
+        started = perf_counter()
+        proc = subprocess.run([python, DETECTOR_PATH], input=json.dumps(payload),
+                              capture_output=True, text=True)
+        latencies.append(perf_counter() - started)
+        if proc.returncode == 0:
+            results.append(json.loads(proc.stdout))
+        else:
+            results.append({'error': proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else 'failed'})
+    return latencies, results
+
+def run_worker(payloads: Dict[str, Dict], python: str) -> Tuple[List[float], List[Dict]]:
+    """One resident worker serving every SKU over newline-delimited JSON
+
+    Worker startup still counts towards wall time and throughput.
+    """
+    latencies, results = [], []
+    proc = subprocess.Popen([python, DETECTOR_PATH, '--worker'], stdin=subprocess.PIPE,
+                            stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    try:
+        # An empty probe returns as soon as the worker is up, keeping startup out of request latency
+        proc.stdin.write('{}\n')
+        proc.stdin.flush()
+        proc.stdout.readline()
+
+        for payload in payloads.values():
+            started = perf_counter()
+            proc.stdin.write(json.dumps(payload) + '\n')
+            proc.stdin.flush()
+            results.append(json.loads(proc.stdout.readline()))
+            latencies.append(perf_counter() - started)
+    finally:
+        proc.stdin.close()
+        proc.wait()
+    return latencies, results
+
+def run_batch(payloads: Dict[str, Dict], python: str) -> Tuple[List[float], List[Dict]]:
+    """A single --batch invocation; per-SKU latency is the in-process stage time"""
+    proc = subprocess.run([python, DETECTOR_PATH, '--batch'], input=json.dumps(payloads),
+                          capture_output=True, text=True)
+    if proc.returncode != 0:
+        error = proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else 'failed'
+        return [], [{'error': error} for _ in payloads]
+
+    results = list(json.loads(proc.stdout).values())
+    latencies = [
+        sum(t['seconds'] for t in r.get('model_info', {}).get('stage_timings', {}).values())
+        for r in results if 'error' not in r
+    ]
+    return latencies, results
+
+MODE_RUNNERS = {'single': run_single, 'worker': run_worker, 'batch': run_batch}
+
+def run_case(mode: str, engine: str, series: Dict[str, List[Dict]], horizon: int, python: str) -> Dict:
+    """Run one (mode, engine) combination and summarize latency, throughput and memory"""
+    payloads = {sku: {'historical_data': rows, 'horizon': horizon, 'engine': engine}
+                for sku, rows in series.items()}
+
+    started = perf_counter()
+    latencies, results = MODE_RUNNERS[mode](payloads, python)
+    wall_seconds = perf_counter() - started
+
+    errors = sum(1 for r in results if 'error' in r)
+    return {
+        'mode': mode,
+        'engine': engine,
+        'series_length': len(next(iter(series.values()))),
+        'sku_count': len(series),
+        'wall_seconds': round(wall_seconds, 4),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 2) if latencies else None,
+        'p95_ms': round(percentile(latencies, 95) * 1000, 2) if latencies else None,
+        'throughput_sku_per_s': round((len(results) - errors) / wall_seconds, 3) if wall_seconds > 0 else None,
+        'peak_rss_mb': max((result_peak_rss_mb(r) for r in results), default=0.0),
+        'errors': errors
+    }
+
+def case_key(case: Dict) -> Tuple:
+    return (case['mode'], case['engine'], case['series_length'], case['sku_count'])
+
+def compare_to_baseline(report: Dict, baseline: Dict, tolerance: float) -> List[Dict]:
+    """Cases whose p95 latency, throughput or memory regressed beyond the tolerance"""
+    baseline_cases = {case_key(c): c for c in baseline.get('results', [])}
+    regressions = []
+    for case in report['results']:
+        previous = baseline_cases.get(case_key(case))
+        if previous is None:
+            continue
+        checks = [
+            ('p95_ms', case['p95_ms'], previous.get('p95_ms'), True),
+            ('throughput_sku_per_s', case['throughput_sku_per_s'], previous.get('throughput_sku_per_s'), False),
+            ('peak_rss_mb', case['peak_rss_mb'], previous.get('peak_rss_mb'), True),
+        ]
+        for metric, current, before, higher_is_worse in checks:
+            if current is None or not before:
+                continue
+            change = (current - before) / before
+            if (change > tolerance) if higher_is_worse else (change < -tolerance):
+                regressions.append({
+                    'case': dict(zip(['mode', 'engine', 'series_length', 'sku_count'], case_key(case))),
+                    'metric': metric,
+                    'baseline': before,
+                    'current': current,
+                    'change_pct': round(change * 100, 1)
+                })
+    return regressions
+
+def parse_int_list(value: str) -> List[int]:
+    return [int(v) for v in value.split(',') if v]
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description='Benchmark the Prophet seasonal detector')
+    parser.add_argument('--lengths', type=parse_int_list, default=[90, 365, 1825],
+                        help='Comma-separated series lengths in days (default: 90,365,1825)')
+    parser.add_argument('--sku-counts', type=parse_int_list, default=[10],
+                        help='Comma-separated SKU counts (default: 10)')
+    parser.add_argument('--modes', default=','.join(MODES), help=f'Comma-separated subset of {MODES}')
+    parser.add_argument('--engines', default=','.join(ENGINES), help=f'Comma-separated subset of {ENGINES}')
+    parser.add_argument('--horizon', type=int, default=7)
+    parser.add_argument('--seed', type=int, default=42, help='Seed for the synthetic data generator')
+    parser.add_argument('--data', help='Load series from a sccc2.py output file (.csv/.parquet/.feather/.npz) '
+                                       'instead of generating them')
+    parser.add_argument('--python', default=sys.executable, help='Interpreter used to run the detector')
+    parser.add_argument('--output', help='Write the JSON report here instead of stdout')
+    parser.add_argument('--baseline', help='Stored report to compare against; exits 1 on regression')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='Allowed relative regression against the baseline (default: 0.2)')
+    return parser.parse_args(argv)
+
+def main():
+    args = parse_args(sys.argv[1:])
+    modes = [m for m in args.modes.split(',') if m]
+    engines = [e for e in args.engines.split(',') if e]
+    for mode in modes:
+        if mode not in MODES:
+            raise SystemExit(f"Unknown mode '{mode}' (expected one of {MODES})")
+
+    report = {
+        'environment': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpu_count': os.cpu_count()
+        },
+        'config': {
+            'lengths': args.lengths,
+            'sku_counts': args.sku_counts,
+            'modes': modes,
+            'engines': engines,
+            'horizon': args.horizon,
+            'seed': args.seed,
+            'data': args.data
+        },
+        'results': []
+    }
+
+    for series_length in args.lengths:
+        for sku_count in args.sku_counts:
+            if args.data:
+                series = load_series(args.data, series_length, sku_count)
+            else:
+                series = generate_series(series_length, sku_count, args.seed)
+            for mode in modes:
+                for engine in engines:
+                    case = run_case(mode, engine, series, args.horizon, args.python)
+                    print(f"{mode:6} {engine:7} len={series_length:<5} skus={sku_count:<4} "
+                          f"p50={case['p50_ms']}ms p95={case['p95_ms']}ms "
+                          f"{case['throughput_sku_per_s']} SKU/s peak={case['peak_rss_mb']}MB "
+                          f"errors={case['errors']}", file=sys.stderr)
+                    report['results'].append(case)
+
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline, 'r', encoding='utf-8') as f:
+            baseline = json.load(f)
+        report['regressions'] = compare_to_baseline(report, baseline, args.tolerance)
+        exit_code = 1 if report['regressions'] else 0
+
+    output = json.dumps(report, indent=2)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+    sys.exit(exit_code)
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,49 @@
+import os
+import sys
 import csv
+import json
+import time
+import socket
 import random
 import math
+import shutil
+import hashlib
+import importlib.util
+import zipfile
+import argparse
+import tempfile
+import contextlib
+from itertools import chain, groupby, islice
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime, timedelta
-from typing import Dict, List, Tuple
+from typing import Dict, Iterable, Iterator, List, Tuple
+
+import numpy as np
 
 # Enhanced configuration for complex seasonality testing
 NUM_SKUS = 10
 ENTRIES_PER_SKU = 450
 CSV_FILE_PATH = 'supply_chain_data.csv'
+# Rows are written in chunks through a large file buffer; neither grows with the dataset size
+WRITE_CHUNK_ROWS = 10000
+WRITE_BUFFER_BYTES = 1 << 20
+START_DATE = datetime(2023, 1, 1)  # Full year for better pattern detection
+
+CSV_HEADERS = [
+    'Date', 'Product type', 'SKU', 'Price', 'Availability',
+    'Number of products sold', 'Revenue generated', 'Customer demographics',
+    'Stock levels', 'Procurement lead time', 'Shipping times', 'Shipping carriers',
+    'Shipping costs', 'Supplier name', 'Location', 'Manufacturing lead time',
+    'Manufacturing costs', 'is_weekend', 'day_of_week', 'month', 'quarter', 'year',
+    'day_of_year', 'week_of_year', 'is_month_end', 'is_quarter_end',
+    'is_event_active', 'active_event', 'seasonal_multiplier'
+]
+
+# Categorical attributes drawn for every row
+CUSTOMER_DEMOGRAPHICS = ['Male', 'Female', 'Unisex']
+SHIPPING_CARRIERS = ['Express', 'Standard', 'Premium', 'Economy']
+SUPPLIER_NAMES = [f'Supplier_{j}' for j in range(1, 8)]
+LOCATIONS = ['Mumbai', 'Delhi', 'Bangalore', 'Chennai', 'Kolkata', 'Pune']
 
 # Product categories with distinct seasonal behaviors
 PRODUCT_CATEGORIES = {
@@ -76,6 +112,14 @@ WEDDING_SEASONS = [
 # Monsoon patterns (affects different products differently)
 MONSOON_PERIOD = {'start_month': 6, 'end_month': 9, 'intensity_curve': [0.8, 1.2, 1.4, 1.1]}
 
+def annual_cycle(day_of_year: int) -> float:
+    """Annual cycle with multiple harmonics"""
+    return (
+        0.3 * math.sin(2 * math.pi * day_of_year / 365.25) +
+        0.2 * math.sin(4 * math.pi * day_of_year / 365.25) +
+        0.1 * math.sin(6 * math.pi * day_of_year / 365.25)
+    )
+
 def get_complex_seasonality(date: datetime, product_type: str) -> float:
     """Generate complex seasonal patterns for Prophet to detect"""
     multiplier = 1.0
@@ -85,13 +129,7 @@ def get_complex_seasonality(date: datetime, product_type: str) -> float:
     product_config = PRODUCT_CATEGORIES.get(product_type, PRODUCT_CATEGORIES['skincare'])
     
     # 1. Basic seasonal cycles (multiple harmonics for complexity)
-    # Annual cycle with multiple harmonics
-    annual_cycle = (
-        0.3 * math.sin(2 * math.pi * day_of_year / 365.25) +
-        0.2 * math.sin(4 * math.pi * day_of_year / 365.25) +
-        0.1 * math.sin(6 * math.pi * day_of_year / 365.25)
-    )
-    multiplier += annual_cycle
+    multiplier += annual_cycle(day_of_year)
     
     # 2. Product-specific seasonal adjustments
     if product_type == 'skincare':
@@ -228,25 +266,346 @@ def get_peak_date(year: int, event_info: Dict) -> datetime:
     return datetime(year, event_info.get('peak_month', event_info.get('start_month')), 
                    event_info.get('peak_day', 15))
 
-def add_complex_noise(base_value: float, noise_level: float = 0.1) -> float:
-    """Add complex noise patterns that Prophet should handle"""
+# Array-based calendar engine: the same seasonality, event and date features as the scalar
+# functions above, computed for a whole date range at once. Every multiplication happens in the
+# same order as in the scalar code, and the annual cycle is looked up from the scalar formula,
+# so results match bit for bit.
+
+# annual_cycle() for day_of_year 0-366
+ANNUAL_CYCLE_TABLE = np.array([annual_cycle(day) for day in range(367)])
+
+def iso_weeks_in_year(years: np.ndarray) -> np.ndarray:
+    """52 or 53: ISO years with 53 weeks start on a Thursday, or a Wednesday in leap years"""
+    def dec31_weekday(y):
+        return (y + y // 4 - y // 100 + y // 400) % 7
+    return 52 + ((dec31_weekday(years) == 4) | (dec31_weekday(years - 1) == 3))
+
+def calendar_date_features(start_date: datetime, n_days: int) -> Dict[str, np.ndarray]:
+    """Date features for n_days consecutive days, matching the datetime attributes used per row"""
+    dates = np.datetime64(start_date.date(), 'D') + np.arange(n_days)
+    years = dates.astype('datetime64[Y]').astype(np.int64) + 1970
+    months = dates.astype('datetime64[M]').astype(np.int64) % 12 + 1
+    days = (dates - dates.astype('datetime64[M]')).astype(np.int64) + 1
+    day_of_year = (dates - dates.astype('datetime64[Y]')).astype(np.int64) + 1
+    weekday = (dates.astype(np.int64) + 3) % 7  # 1970-01-01 was a Thursday
+    
+    # ISO week number, as date.isocalendar()[1]
+    week = (day_of_year - (weekday + 1) + 10) // 7
+    week = np.where(week < 1, iso_weeks_in_year(years - 1), np.where(week > iso_weeks_in_year(years), 1, week))
+    
+    return {
+        'date': dates,
+        'year': years,
+        'month': months,
+        'day': days,
+        'day_of_year': day_of_year,
+        'weekday': weekday,
+        'week_of_year': week,
+        'quarter': (months - 1) // 3 + 1,
+        'is_weekend': (weekday >= 5).astype(np.int64),
+        'is_month_end': (days >= 28).astype(np.int64),
+        'is_quarter_end': ((months % 3 == 0) & (days >= 28)).astype(np.int64)
+    }
+
+def month_in_range(months: np.ndarray, start_month: int, end_month: int) -> np.ndarray:
+    """Array version of is_in_season_range"""
+    if start_month <= end_month:
+        return (months >= start_month) & (months <= end_month)
+    return (months >= start_month) | (months <= end_month)
+
+def dates_in_year(years: np.ndarray, month: int, day: int) -> np.ndarray:
+    """datetime64[D] of month/day in each given year"""
+    return ((years - 1970) * 12 + (month - 1)).astype('datetime64[M]') + np.timedelta64(day - 1, 'D')
+
+def complex_seasonality_array(features: Dict[str, np.ndarray], product_type: str) -> np.ndarray:
+    """get_complex_seasonality for every day in features"""
+    months = features['month']
+    days = features['day']
+    weekday = features['weekday']
+    product_config = PRODUCT_CATEGORIES.get(product_type, PRODUCT_CATEGORIES['skincare'])
+    
+    multiplier = 1.0 + ANNUAL_CYCLE_TABLE[features['day_of_year']]
+    
+    def scale(mask, factor):
+        return np.where(mask, multiplier * factor, multiplier)
+    
+    if product_type == 'skincare':
+        winter = np.isin(months, [11, 12, 1, 2])
+        monsoon = ~winter & np.isin(months, [6, 7, 8, 9])
+        summer = ~winter & ~monsoon & np.isin(months, [4, 5])
+        multiplier = scale(winter, product_config.get('winter_boost', 1.0))
+        multiplier = scale(monsoon, product_config.get('monsoon_boost', 1.0))
+        multiplier = scale(summer, product_config.get('summer_penalty', 1.0))
+    elif product_type == 'haircare':
+        monsoon = np.isin(months, [6, 7, 8, 9])
+        multiplier = scale(monsoon, product_config.get('monsoon_boost', 1.0))
+        multiplier = scale(~monsoon & np.isin(months, [3, 4, 5]), product_config.get('summer_boost', 1.0))
+    elif product_type == 'suncare':
+        summer = np.isin(months, [3, 4, 5, 6])
+        multiplier = scale(summer, product_config.get('summer_boost', 1.0))
+        multiplier = scale(~summer & np.isin(months, [11, 12, 1, 2]), product_config.get('winter_penalty', 1.0))
+    
+    if product_type in ['cosmetics', 'fragrances']:
+        for wedding_season in WEDDING_SEASONS:
+            in_season = month_in_range(months, wedding_season['start_month'], wedding_season['end_month'])
+            multiplier = scale(in_season, wedding_season['intensity'])
+    
+    multiplier = scale(weekday == 5, 1.3)
+    multiplier = scale(weekday == 6, 1.2)
+    multiplier = scale((weekday == 1) | (weekday == 2), 0.9)
+    
+    month_end = days >= 28
+    month_start = ~month_end & (days <= 3)
+    multiplier = scale(month_end, 1.15)
+    multiplier = scale(month_start, 1.1)
+    multiplier = scale(~month_end & ~month_start & (days >= 10) & (days <= 15), 0.95)
+    
+    return np.maximum(0.3, np.minimum(3.0, multiplier))
+
+def event_boost_array(features: Dict[str, np.ndarray], product_type: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """calculate_event_boost for every day in features: (boost, active, event name)"""
+    dates = features['date']
+    years = features['year']
+    n_days = len(dates)
+    boost = np.ones(n_days)
+    active = np.zeros(n_days, dtype=bool)
+    names = np.full(n_days, 'None', dtype=object)
+    
+    # Major holidays, first match wins
+    for holiday, info in MAJOR_HOLIDAYS.items():
+        matched = ~active & month_in_range(features['month'], info['start_month'], info['end_month'])
+        peak = dates_in_year(years, info.get('peak_month', info.get('start_month')), info.get('peak_day', 15))
+        days_to_peak = np.abs((dates - peak).astype(np.int64))
+        buildup_factor = np.where(
+            days_to_peak <= info['buildup_days'],
+            1.0 - (days_to_peak / (info['buildup_days'] + 1)) * 0.3,
+            0.7)  # Post-event decline
+        event_boost = info['boost'] * buildup_factor
+        if holiday in ['Diwali', 'Christmas'] and product_type in ['cosmetics', 'fragrances']:
+            event_boost = event_boost * 1.2
+        elif holiday == 'Holi' and product_type == 'skincare':
+            event_boost = event_boost * 0.8
+        
+        boost = np.where(matched, boost * event_boost, boost)
+        names[matched] = holiday
+        active |= matched
+    
+    # Seasonal events only where no holiday applied
+    for event, info in SEASONAL_EVENTS.items():
+        event_dates = dates_in_year(years, info['month'], info['day'])
+        # datetime() rejects e.g. Feb 29 in common years, which the scalar check treats as no event
+        valid = (event_dates.astype('datetime64[M]').astype(np.int64) % 12 + 1) == info['month']
+        start = event_dates - np.timedelta64(info.get('buildup_days', 0), 'D')
+        end = event_dates + np.timedelta64(info.get('duration', 1), 'D')
+        matched = ~active & valid & (dates >= start) & (dates <= end)
+        
+        days_to_event = np.abs((dates - event_dates).astype(np.int64))
+        buildup_factor = np.where(
+            days_to_event <= info.get('buildup_days', 0),
+            1.0 - (days_to_event / (info.get('buildup_days', 1) + 1)) * 0.2,
+            0.8)
+        event_boost = info['boost'] * buildup_factor
+        if event == 'Valentine\'s Day' and product_type in ['cosmetics', 'fragrances']:
+            event_boost = event_boost * 1.3
+        elif event in ['Black Friday', 'Cyber Monday']:
+            event_boost = event_boost * 1.1  # Universal boost
+        elif event == 'Summer Sale' and product_type == 'suncare':
+            event_boost = event_boost * 1.4
+        
+        boost = np.where(matched, boost * event_boost, boost)
+        names[matched] = event
+        active |= matched
+    
+    return boost, active, names
+
+def event_peak_window(features: Dict[str, np.ndarray]) -> np.ndarray:
+    """Days from buildup_days before a holiday's peak or a seasonal event's date to duration days after it
+
+    MAJOR_HOLIDAYS mark whole months as active, so this is the narrower window around each peak.
+    """
+    dates = features['date']
+    years = features['year']
+    near = np.zeros(len(dates), dtype=bool)
+    peaks = [(info.get('peak_month', info.get('start_month')), info.get('peak_day', 15), info)
+             for info in MAJOR_HOLIDAYS.values()]
+    peaks += [(info['month'], info['day'], info) for info in SEASONAL_EVENTS.values()]
+    for month, day, info in peaks:
+        # Neighbouring years too, so windows crossing New Year are not cut off
+        for year_offset in (-1, 0, 1):
+            peak = dates_in_year(years + year_offset, month, day)
+            start = peak - np.timedelta64(info.get('buildup_days', 0), 'D')
+            end = peak + np.timedelta64(info.get('duration', 1), 'D')
+            near |= (dates >= start) & (dates <= end)
+    return near
+
+def build_calendar_table(start_date: datetime, n_days: int) -> Dict:
+    """Per-day date features and per-(day, category) seasonality and event boosts as plain Python lists
+
+    Lists of Python scalars keep the generated rows identical in type to the scalar path.
+    """
+    features = calendar_date_features(start_date, n_days)
+    table = {
+        'date_strings': [str(d) for d in features['date']],
+        'features': {name: values.tolist() for name, values in features.items() if name != 'date'},
+        'near_event_peak': event_peak_window(features).tolist(),
+        'categories': {}
+    }
+    for product_type in PRODUCT_CATEGORIES:
+        boost, active, names = event_boost_array(features, product_type)
+        table['categories'][product_type] = {
+            'seasonal_multiplier': complex_seasonality_array(features, product_type).tolist(),
+            'event_boost': boost.tolist(),
+            'event_active': active.tolist(),
+            'event_name': names.tolist()
+        }
+    return table
+
+def add_complex_noise(base_value: float, noise_level: float = 0.1, rng=random) -> float:
+    """Add complex noise patterns that Prophet should handle
+
+    rng is the random module or a random.Random stream.
+    """
     # Multiple noise components
-    gaussian_noise = random.gauss(0, base_value * noise_level)
+    gaussian_noise = rng.gauss(0, base_value * noise_level)
     
     # Occasional spikes (supply disruptions, viral social media, etc.)
-    if random.random() < 0.02:  # 2% chance of anomaly
-        spike = random.choice([0.3, 1.8, 2.5])  # Supply shortage or viral demand
+    if rng.random() < 0.02:  # 2% chance of anomaly
+        spike = rng.choice([0.3, 1.8, 2.5])  # Supply shortage or viral demand
         gaussian_noise += base_value * (spike - 1.0)
     
     # Weekly autocorrelation noise
-    weekly_noise = base_value * 0.05 * math.sin(random.uniform(0, 2 * math.pi))
+    weekly_noise = base_value * 0.05 * math.sin(rng.uniform(0, 2 * math.pi))
     
     return base_value + gaussian_noise + weekly_noise
 
-def generate_enhanced_data():
-    """Generate enhanced dataset with complex seasonality patterns"""
-    data = []
-    start_date = datetime(2023, 1, 1)  # Full year for better pattern detection
+def sku_label(sku: int) -> str:
+    return f'SKU{sku:03d}'
+
+def iter_sku_rows(sku: int, calendar: Dict, rng=random, verbose: bool = True) -> Iterator[List]:
+    """Yield every row of one SKU over the calendar's date range
+
+    rng is the random module (the legacy sequential stream) or a per-SKU random.Random.
+    """
+    date_features = calendar['features']
+    
+    product_type = rng.choice(list(PRODUCT_CATEGORIES.keys()))
+    product_config = PRODUCT_CATEGORIES[product_type]
+    
+    # Initialize product-specific parameters
+    base_demand = rng.uniform(*product_config['base_demand'])
+    trend = rng.uniform(*product_config['trend'])
+    
+    # Multiple seasonal components for complexity
+    annual_amplitude = rng.uniform(30, 80)
+    monthly_amplitude = rng.uniform(15, 30)
+    weekly_amplitude = rng.uniform(10, 25)
+    
+    if verbose:
+        print(f"Generating SKU{sku} ({product_type}) - Base: {base_demand:.1f}, Trend: {trend:.3f}")
+    category_calendar = calendar['categories'][product_type]
+    
+    for i in range(len(calendar['date_strings'])):
+        # 1. Base trend
+        base_with_trend = base_demand + (trend * i)
+        
+        # 2. Complex seasonality (multiple components)
+        seasonal_multiplier = category_calendar['seasonal_multiplier'][i]
+        demand_with_seasonality = base_with_trend * seasonal_multiplier
+        
+        # 3. Event boosts
+        event_boost = category_calendar['event_boost'][i]
+        event_active = category_calendar['event_active'][i]
+        event_name = category_calendar['event_name'][i]
+        demand_with_events = demand_with_seasonality * event_boost
+        
+        # 4. Add complex noise
+        final_demand = add_complex_noise(demand_with_events, noise_level=0.08, rng=rng)
+        final_demand = max(10, final_demand)  # Minimum realistic demand
+        
+        # Generate corresponding supply chain data
+        price = round(rng.uniform(15.0, 120.0), 2)
+        availability = rng.randint(85, 100)
+        
+        # Stock levels influenced by seasonality (smart inventory management)
+        base_stock = rng.randint(200, 500)
+        if event_active:
+            stock_multiplier = 1.3  # Stock up for events
+        else:
+            stock_multiplier = 1.0 + (seasonal_multiplier - 1.0) * 0.3  # Moderate stock adjustment
+        
+        stock_levels = int(base_stock * stock_multiplier)
+        
+        # Sales calculation (constrained by stock)
+        max_possible_sales = min(int(final_demand * 1.2), stock_levels)
+        products_sold = max(5, min(int(final_demand), max_possible_sales))
+        
+        revenue = round(products_sold * price, 2)
+        
+        # Supply chain metrics with some realism
+        procurement_lead_time = rng.randint(3, 25)
+        manufacturing_lead_time = rng.randint(5, 20)
+        shipping_times = rng.randint(1, 8)
+        shipping_costs = round(rng.uniform(8.0, 30.0), 2)
+        manufacturing_costs = round(price * rng.uniform(0.35, 0.65), 2)
+        
+        # Categorical variables
+        demographics = rng.choice(CUSTOMER_DEMOGRAPHICS)
+        carrier = rng.choice(SHIPPING_CARRIERS)
+        supplier = rng.choice(SUPPLIER_NAMES)
+        location = rng.choice(LOCATIONS)
+        
+        # Date features
+        is_weekend = date_features['is_weekend'][i]
+        day_of_week = date_features['weekday'][i]
+        month = date_features['month'][i]
+        quarter = date_features['quarter'][i]
+        year = date_features['year'][i]
+        
+        # Add derived features that might help both Prophet and XGBoost
+        day_of_year = date_features['day_of_year'][i]
+        week_of_year = date_features['week_of_year'][i]
+        is_month_end = date_features['is_month_end'][i]
+        is_quarter_end = date_features['is_quarter_end'][i]
+        
+        yield [
+            calendar['date_strings'][i],
+            product_type,
+            sku_label(sku),
+            price,
+            availability,
+            products_sold,
+            revenue,
+            demographics,
+            stock_levels,
+            procurement_lead_time,
+            shipping_times,
+            carrier,
+            shipping_costs,
+            supplier,
+            location,
+            manufacturing_lead_time,
+            manufacturing_costs,
+            is_weekend,
+            day_of_week,
+            month,
+            quarter,
+            year,
+            day_of_year,
+            week_of_year,
+            is_month_end,
+            is_quarter_end,
+            1 if event_active else 0,
+            event_name,
+            round(seasonal_multiplier, 4)
+        ]
+
+def generate_sku_rows(sku: int, calendar: Dict, rng=random, verbose: bool = True) -> List[List]:
+    """Generate every row of one SKU over the calendar's date range"""
+    return list(iter_sku_rows(sku, calendar, rng, verbose))
+
+def iter_enhanced_data() -> Iterator[List]:
+    """Yield the enhanced dataset row by row without holding it in memory"""
+    start_date = START_DATE
     
     print(f"Generating enhanced dataset with {NUM_SKUS} SKUs and {ENTRIES_PER_SKU} days each...")
     print("Complex patterns included:")
@@ -257,171 +616,402 @@ def generate_enhanced_data():
     print("- Weekly and monthly cycles")
     print("- Supply disruption anomalies")
     
+    # Seasonality, events and date features depend only on (day, category): compute them once
+    calendar = build_calendar_table(start_date, ENTRIES_PER_SKU)
+    
     for sku in range(1, NUM_SKUS + 1):
-        product_type = random.choice(list(PRODUCT_CATEGORIES.keys()))
-        product_config = PRODUCT_CATEGORIES[product_type]
-        
-        # Initialize product-specific parameters
-        base_demand = random.uniform(*product_config['base_demand'])
-        trend = random.uniform(*product_config['trend'])
-        
-        # Multiple seasonal components for complexity
-        annual_amplitude = random.uniform(30, 80)
-        monthly_amplitude = random.uniform(15, 30)
-        weekly_amplitude = random.uniform(10, 25)
-        
-        print(f"Generating SKU{sku} ({product_type}) - Base: {base_demand:.1f}, Trend: {trend:.3f}")
-        
-        for i in range(ENTRIES_PER_SKU):
-            date = start_date + timedelta(days=i)
-            
-            # 1. Base trend
-            base_with_trend = base_demand + (trend * i)
-            
-            # 2. Complex seasonality (multiple components)
-            seasonal_multiplier = get_complex_seasonality(date, product_type)
-            demand_with_seasonality = base_with_trend * seasonal_multiplier
-            
-            # 3. Event boosts
-            event_boost, event_active, event_name = calculate_event_boost(date, product_type)
-            demand_with_events = demand_with_seasonality * event_boost
-            
-            # 4. Add complex noise
-            final_demand = add_complex_noise(demand_with_events, noise_level=0.08)
-            final_demand = max(10, final_demand)  # Minimum realistic demand
-            
-            # Generate corresponding supply chain data
-            price = round(random.uniform(15.0, 120.0), 2)
-            availability = random.randint(85, 100)
-            
-            # Stock levels influenced by seasonality (smart inventory management)
-            base_stock = random.randint(200, 500)
-            if event_active:
-                stock_multiplier = 1.3  # Stock up for events
-            else:
-                stock_multiplier = 1.0 + (seasonal_multiplier - 1.0) * 0.3  # Moderate stock adjustment
-            
-            stock_levels = int(base_stock * stock_multiplier)
-            
-            # Sales calculation (constrained by stock)
-            max_possible_sales = min(int(final_demand * 1.2), stock_levels)
-            products_sold = max(5, min(int(final_demand), max_possible_sales))
-            
-            revenue = round(products_sold * price, 2)
-            
-            # Supply chain metrics with some realism
-            procurement_lead_time = random.randint(3, 25)
-            manufacturing_lead_time = random.randint(5, 20)
-            shipping_times = random.randint(1, 8)
-            shipping_costs = round(random.uniform(8.0, 30.0), 2)
-            manufacturing_costs = round(price * random.uniform(0.35, 0.65), 2)
-            
-            # Categorical variables
-            demographics = random.choice(['Male', 'Female', 'Unisex'])
-            carrier = random.choice(['Express', 'Standard', 'Premium', 'Economy'])
-            supplier = random.choice([f'Supplier_{j}' for j in range(1, 8)])
-            location = random.choice(['Mumbai', 'Delhi', 'Bangalore', 'Chennai', 'Kolkata', 'Pune'])
-            
-            # Date features
-            is_weekend = 1 if date.weekday() >= 5 else 0
-            day_of_week = date.weekday()
-            month = date.month
-            quarter = (date.month - 1) // 3 + 1
-            year = date.year
-            
-            # Add derived features that might help both Prophet and XGBoost
-            day_of_year = date.timetuple().tm_yday
-            week_of_year = date.isocalendar()[1]
-            is_month_end = 1 if date.day >= 28 else 0
-            is_quarter_end = 1 if month % 3 == 0 and date.day >= 28 else 0
-            
-            data.append([
-                date.strftime('%Y-%m-%d'),
-                product_type,
-                f'SKU{sku:03d}',
-                price,
-                availability,
-                products_sold,
-                revenue,
-                demographics,
-                stock_levels,
-                procurement_lead_time,
-                shipping_times,
-                carrier,
-                shipping_costs,
-                supplier,
-                location,
-                manufacturing_lead_time,
-                manufacturing_costs,
-                is_weekend,
-                day_of_week,
-                month,
-                quarter,
-                year,
-                day_of_year,
-                week_of_year,
-                is_month_end,
-                is_quarter_end,
-                1 if event_active else 0,
-                event_name,
-                round(seasonal_multiplier, 4)
-            ])
-    
-    return data
+        yield from iter_sku_rows(sku, calendar, random)
 
-def write_csv_data(data: List[List]) -> None:
-    """Write data to CSV file"""
-    headers = [
-        'Date', 'Product type', 'SKU', 'Price', 'Availability',
-        'Number of products sold', 'Revenue generated', 'Customer demographics',
-        'Stock levels', 'Procurement lead time', 'Shipping times', 'Shipping carriers',
-        'Shipping costs', 'Supplier name', 'Location', 'Manufacturing lead time',
-        'Manufacturing costs', 'is_weekend', 'day_of_week', 'month', 'quarter', 'year',
-        'day_of_year', 'week_of_year', 'is_month_end', 'is_quarter_end',
-        'is_event_active', 'active_event', 'seasonal_multiplier'
+def generate_enhanced_data() -> List[List]:
+    """Generate enhanced dataset with complex seasonality patterns"""
+    return list(iter_enhanced_data())
+
+# Sharded generation gives every SKU its own random stream derived from a master seed, so the
+# data does not depend on how SKUs are split into shards or across worker processes
+DEFAULT_SKUS_PER_SHARD = 100
+
+def sku_rng(master_seed: int, sku: int) -> random.Random:
+    """Independent, reproducible random stream for one SKU"""
+    digest = hashlib.sha256(f'{master_seed}:{sku}'.encode('utf-8')).digest()
+    return random.Random(int.from_bytes(digest[:8], 'big'))
+
+def shard_file_path(shard_dir: str, shard_index: int, output_format: str = 'csv') -> str:
+    return os.path.join(shard_dir, f'shard_{shard_index:05d}{OUTPUT_EXTENSIONS[output_format]}')
+
+def generate_shard(master_seed: int, first_sku: int, last_sku: int, n_days: int, path: str,
+                   output_format: str = 'csv') -> int:
+    """Write SKUs first_sku..last_sku to one shard file and return its row count"""
+    calendar = build_calendar_table(START_DATE, n_days)
+    rows = chain.from_iterable(
+        iter_sku_rows(sku, calendar, sku_rng(master_seed, sku), verbose=False)
+        for sku in range(first_sku, last_sku + 1)
+    )
+    sku_labels = [sku_label(sku) for sku in range(first_sku, last_sku + 1)]
+    return write_rows(rows, path, output_format, sku_labels).total_rows
+
+def generate_sharded_data(master_seed: int, num_skus: int, n_days: int, shard_dir: str,
+                          workers: int = 1, skus_per_shard: int = DEFAULT_SKUS_PER_SHARD,
+                          output_format: str = 'csv') -> List[str]:
+    """Generate SKUs in fixed-size shards, in a process pool when workers > 1; returns the shard paths in order"""
+    os.makedirs(shard_dir, exist_ok=True)
+    shards = [
+        (master_seed, first_sku, min(first_sku + skus_per_shard - 1, num_skus), n_days,
+         shard_file_path(shard_dir, index, output_format), output_format)
+        for index, first_sku in enumerate(range(1, num_skus + 1, skus_per_shard))
     ]
+    print(f"Generating {num_skus} SKUs x {n_days} days in {len(shards)} shards with {workers} worker(s), seed {master_seed}...")
     
-    with open(CSV_FILE_PATH, 'w', newline='', encoding='utf-8') as csvfile:
-        writer = csv.writer(csvfile)
-        writer.writerow(headers)
-        writer.writerows(data)
+    if workers <= 1:
+        row_counts = [generate_shard(*shard) for shard in shards]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            row_counts = list(pool.map(generate_shard, *zip(*shards)))
     
-    print(f"\nEnhanced CSV generated: {CSV_FILE_PATH}")
-    print(f"Total entries: {len(data):,}")
-    print(f"Columns: {len(headers)}")
-    print(f"Date range: {data[0][0]} to {data[-1][0]}")
+    print(f"Wrote {sum(row_counts):,} rows to {shard_dir}")
+    return [shard[4] for shard in shards]
 
-def print_data_summary(data: List[List]) -> None:
-    """Print summary statistics of generated data"""
-    print("\n" + "="*50)
-    print("DATA GENERATION SUMMARY")
-    print("="*50)
+def merge_shards(shard_paths: List[str], output_path: str) -> None:
+    """Concatenate shards in order into one CSV with a single header row"""
+    with open(output_path, 'w', newline='', encoding='utf-8') as output:
+        for index, path in enumerate(shard_paths):
+            with open(path, 'r', newline='', encoding='utf-8') as shard:
+                header = shard.readline()
+                if index == 0:
+                    output.write(header)
+                shutil.copyfileobj(shard, output)
+    print(f"Merged {len(shard_paths)} shards into {output_path}")
+
+class DataSummary:
+    """Summary statistics gathered one row at a time while the data is written"""
     
-    # Group by product type
-    product_stats = {}
-    event_count = 0
+    def __init__(self):
+        self.total_rows = 0
+        self.event_count = 0
+        self.first_date = None
+        self.last_date = None
+        # product type -> [count, sum, min, max] of products sold
+        self.product_stats = {}
     
-    for row in data:
+    def add(self, row: List) -> None:
         product_type = row[1]
         products_sold = row[5]
         is_event = row[27]
         
-        if product_type not in product_stats:
-            product_stats[product_type] = []
-        product_stats[product_type].append(products_sold)
+        if self.first_date is None:
+            self.first_date = row[0]
+        self.last_date = row[0]
+        self.total_rows += 1
+        
+        stats = self.product_stats.get(product_type)
+        if stats is None:
+            self.product_stats[product_type] = [1, products_sold, products_sold, products_sold]
+        else:
+            stats[0] += 1
+            stats[1] += products_sold
+            stats[2] = min(stats[2], products_sold)
+            stats[3] = max(stats[3], products_sold)
         
         if is_event:
-            event_count += 1
+            self.event_count += 1
+
+def summarize_data(data: Iterable[List]) -> DataSummary:
+    summary = DataSummary()
+    for row in data:
+        summary.add(row)
+    return summary
+
+def write_csv_stream(rows: Iterable[List], path: str) -> DataSummary:
+    """Write rows to a CSV file in chunks as they are produced; returns their summary"""
+    summary = DataSummary()
+    rows = iter(rows)
+    
+    with open(path, 'w', newline='', encoding='utf-8', buffering=WRITE_BUFFER_BYTES) as csvfile:
+        writer = csv.writer(csvfile)
+        writer.writerow(CSV_HEADERS)
+        while True:
+            chunk = list(islice(rows, WRITE_CHUNK_ROWS))
+            if not chunk:
+                break
+            writer.writerows(chunk)
+            for row in chunk:
+                summary.add(row)
+    return summary
+
+# Columnar output: categoricals are dictionary-encoded against fixed category lists and the
+# other columns get the narrowest dtype that holds the generator's ranges. Rows stay in SKU
+# order and every written chunk (Parquet row group, Feather record batch) holds whole SKUs.
+OUTPUT_FORMATS = ['csv', 'parquet', 'feather', 'npz']
+OUTPUT_EXTENSIONS = {'csv': '.csv', 'parquet': '.parquet', 'feather': '.feather', 'npz': '.npz'}
+ARROW_FORMATS = ['parquet', 'feather']
+
+COLUMN_DTYPES = {
+    'Date': 'datetime64[D]',
+    'Price': np.float32,
+    'Availability': np.int8,
+    'Number of products sold': np.int32,
+    'Revenue generated': np.float64,
+    'Stock levels': np.int16,
+    'Procurement lead time': np.int8,
+    'Shipping times': np.int8,
+    'Shipping costs': np.float32,
+    'Manufacturing lead time': np.int8,
+    'Manufacturing costs': np.float32,
+    'is_weekend': np.int8,
+    'day_of_week': np.int8,
+    'month': np.int8,
+    'quarter': np.int8,
+    'year': np.int16,
+    'day_of_year': np.int16,
+    'week_of_year': np.int8,
+    'is_month_end': np.int8,
+    'is_quarter_end': np.int8,
+    'is_event_active': np.int8,
+    'seasonal_multiplier': np.float32
+}
+
+def pyarrow_available() -> bool:
+    return importlib.util.find_spec('pyarrow') is not None
+
+def import_pyarrow():
+    """pyarrow is optional and heavy to import, so it is only loaded for parquet/feather files"""
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError:
+        raise ImportError("Parquet and Feather files require pyarrow (pip install pyarrow); npz needs only numpy")
+    return pyarrow, pyarrow.parquet
+
+def column_categories(sku_labels: List[str]) -> Dict[str, List[str]]:
+    """Dictionary of every categorical column, in code order"""
+    return {
+        'Product type': list(PRODUCT_CATEGORIES),
+        'SKU': sku_labels,
+        'Customer demographics': CUSTOMER_DEMOGRAPHICS,
+        'Shipping carriers': SHIPPING_CARRIERS,
+        'Supplier name': SUPPLIER_NAMES,
+        'Location': LOCATIONS,
+        'active_event': ['None'] + list(MAJOR_HOLIDAYS) + list(SEASONAL_EVENTS)
+    }
+
+def category_code_dtype(n_categories: int):
+    for dtype in (np.int8, np.int16, np.int32):
+        if n_categories <= np.iinfo(dtype).max + 1:
+            return np.dtype(dtype)
+    return np.dtype(np.int64)
+
+def output_path_for(path: str, output_format: str) -> str:
+    """Swap a path's extension for the format's own"""
+    return os.path.splitext(path)[0] + OUTPUT_EXTENSIONS[output_format]
+
+def iter_sku_chunks(rows: Iterable[List], chunk_rows: int = WRITE_CHUNK_ROWS) -> Iterator[List[List]]:
+    """Group rows into chunks of whole SKUs holding at least chunk_rows rows (except the last)"""
+    chunk = []
+    for _, sku_rows in groupby(rows, key=lambda row: row[2]):
+        chunk.extend(sku_rows)
+        if len(chunk) >= chunk_rows:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+def rows_to_columns(chunk: List[List], category_codes: Dict[str, Dict[str, int]],
+                    code_dtypes: Dict[str, np.dtype]) -> Dict[str, np.ndarray]:
+    """Turn a chunk of rows into typed column arrays; categoricals become integer codes"""
+    columns = {}
+    for name, values in zip(CSV_HEADERS, zip(*chunk)):
+        if name in category_codes:
+            codes = category_codes[name]
+            columns[name] = np.fromiter((codes[v] for v in values), dtype=code_dtypes[name], count=len(values))
+        else:
+            columns[name] = np.array(values, dtype=COLUMN_DTYPES[name])
+    return columns
+
+class NpzColumnWriter:
+    """Stream column chunks to per-column spill files, then pack them into an .npz
+
+    Each column is stored as its own .npy member so np.load reads only the columns asked
+    for. Categoricals add a '<name>.categories' member and 'sku_row_offsets' marks where
+    each SKU's rows start.
+    """
+    
+    def __init__(self, path: str, categories: Dict[str, List[str]]):
+        self.path = path
+        self.categories = categories
+        self.spill_dir = tempfile.mkdtemp(prefix='.npz-', dir=os.path.dirname(os.path.abspath(path)))
+        self.spill_files = {
+            name: open(os.path.join(self.spill_dir, f'{index}.bin'), 'wb', buffering=WRITE_BUFFER_BYTES)
+            for index, name in enumerate(CSV_HEADERS)
+        }
+        self.dtypes = {}
+        self.n_rows = 0
+        self.sku_row_offsets = [0]
+    
+    def write(self, columns: Dict[str, np.ndarray]) -> None:
+        for name, values in columns.items():
+            self.dtypes[name] = values.dtype
+            self.spill_files[name].write(values.tobytes())
+        
+        skus = columns['SKU']
+        boundaries = np.flatnonzero(skus[1:] != skus[:-1]) + 1
+        self.sku_row_offsets.extend((self.n_rows + boundaries).tolist())
+        self.n_rows += len(skus)
+        self.sku_row_offsets.append(self.n_rows)
+    
+    def close(self) -> None:
+        try:
+            for spill in self.spill_files.values():
+                spill.close()
+            with zipfile.ZipFile(self.path, 'w', zipfile.ZIP_STORED, allowZip64=True) as archive:
+                for index, name in enumerate(CSV_HEADERS):
+                    header = {'descr': np.lib.format.dtype_to_descr(self.dtypes[name]),
+                              'fortran_order': False, 'shape': (self.n_rows,)}
+                    with archive.open(f'{name}.npy', 'w', force_zip64=True) as member:
+                        np.lib.format.write_array_header_1_0(member, header)
+                        with open(os.path.join(self.spill_dir, f'{index}.bin'), 'rb') as spill:
+                            shutil.copyfileobj(spill, member, WRITE_BUFFER_BYTES)
+                
+                extras = {f'{name}.categories': np.array(values) for name, values in self.categories.items()}
+                extras['sku_row_offsets'] = np.array(self.sku_row_offsets, dtype=np.int64)
+                for name, values in extras.items():
+                    with archive.open(f'{name}.npy', 'w', force_zip64=True) as member:
+                        np.lib.format.write_array(member, values, allow_pickle=False)
+        finally:
+            shutil.rmtree(self.spill_dir, ignore_errors=True)
+
+class ArrowColumnWriter:
+    """Stream column chunks to Parquet (one row group per chunk) or Feather (one record batch per chunk)"""
+    
+    def __init__(self, path: str, categories: Dict[str, List[str]], output_format: str):
+        pa, pq = import_pyarrow()
+        self.pa = pa
+        self.dictionaries = {name: pa.array(values, type=pa.string()) for name, values in categories.items()}
+        fields = []
+        for name in CSV_HEADERS:
+            if name in categories:
+                index_type = pa.from_numpy_dtype(category_code_dtype(len(categories[name])))
+                fields.append(pa.field(name, pa.dictionary(index_type, pa.string())))
+            elif name == 'Date':
+                fields.append(pa.field(name, pa.date32()))
+            else:
+                fields.append(pa.field(name, pa.from_numpy_dtype(np.dtype(COLUMN_DTYPES[name]))))
+        self.schema = pa.schema(fields)
+        if output_format == 'parquet':
+            self.writer = pq.ParquetWriter(path, self.schema)
+        else:
+            self.writer = pa.ipc.new_file(path, self.schema)
+    
+    def write(self, columns: Dict[str, np.ndarray]) -> None:
+        pa = self.pa
+        arrays = []
+        for field in self.schema:
+            values = columns[field.name]
+            if field.name in self.dictionaries:
+                arrays.append(pa.DictionaryArray.from_arrays(pa.array(values), self.dictionaries[field.name]))
+            else:
+                arrays.append(pa.array(values, type=field.type))
+        self.writer.write_table(pa.Table.from_arrays(arrays, schema=self.schema))
+    
+    def close(self) -> None:
+        self.writer.close()
+
+def write_columnar_stream(rows: Iterable[List], path: str, output_format: str,
+                          sku_labels: List[str]) -> DataSummary:
+    """Write rows in SKU-aligned chunks to a typed columnar file; returns their summary
+
+    sku_labels lists every SKU the rows may contain and becomes the SKU dictionary.
+    """
+    categories = column_categories(sku_labels)
+    category_codes = {name: {value: code for code, value in enumerate(values)} for name, values in categories.items()}
+    code_dtypes = {name: category_code_dtype(len(values)) for name, values in categories.items()}
+    if output_format == 'npz':
+        writer = NpzColumnWriter(path, categories)
+    else:
+        writer = ArrowColumnWriter(path, categories, output_format)
+    
+    summary = DataSummary()
+    try:
+        for chunk in iter_sku_chunks(rows):
+            writer.write(rows_to_columns(chunk, category_codes, code_dtypes))
+            for row in chunk:
+                summary.add(row)
+    finally:
+        writer.close()
+    return summary
+
+def write_rows(rows: Iterable[List], path: str, output_format: str = 'csv',
+               sku_labels: List[str] = None) -> DataSummary:
+    if output_format == 'csv':
+        return write_csv_stream(rows, path)
+    return write_columnar_stream(rows, path, output_format, sku_labels)
+
+def load_columnar(path: str, columns: List[str] = None) -> Dict[str, np.ndarray]:
+    """Read selected columns of a generated .csv/.parquet/.feather/.npz file as NumPy arrays
+
+    Only the requested columns are read from columnar files; categoricals come back decoded.
+    """
+    columns = list(columns or CSV_HEADERS)
+    extension = os.path.splitext(path)[1].lower()
+    
+    if extension == '.npz':
+        with np.load(path, allow_pickle=False) as archive:
+            result = {}
+            for name in columns:
+                values = archive[name]
+                if f'{name}.categories' in archive.files:
+                    values = archive[f'{name}.categories'][values]
+                result[name] = values
+            return result
+    
+    if extension in ('.parquet', '.feather'):
+        pa, pq = import_pyarrow()
+        if extension == '.parquet':
+            table = pq.read_table(path, columns=columns)
+        else:
+            with pa.memory_map(path) as source:
+                table = pa.ipc.open_file(source).read_all().select(columns)
+        result = {}
+        for name in columns:
+            column = table.column(name).combine_chunks()
+            if pa.types.is_dictionary(column.type):
+                column = column.dictionary_decode()
+            result[name] = column.to_numpy(zero_copy_only=False)
+        return result
+    
+    with open(path, 'r', newline='', encoding='utf-8') as csvfile:
+        reader = csv.reader(csvfile)
+        header = next(reader)
+        positions = [header.index(name) for name in columns]
+        values = list(zip(*[[row[i] for i in positions] for row in reader]))
+    return {
+        name: np.array(column, dtype=COLUMN_DTYPES.get(name, str))
+        for name, column in zip(columns, values)
+    }
+
+def print_output_report(path: str, summary: DataSummary, output_format: str = 'csv') -> None:
+    print(f"\nEnhanced {output_format.upper()} generated: {path}")
+    print(f"Total entries: {summary.total_rows:,}")
+    print(f"Columns: {len(CSV_HEADERS)}")
+    print(f"Date range: {summary.first_date} to {summary.last_date}")
+
+def write_csv_data(data: List[List]) -> None:
+    """Write data to CSV file"""
+    print_output_report(CSV_FILE_PATH, write_csv_stream(data, CSV_FILE_PATH))
+
+def print_data_summary(data) -> None:
+    """Print summary statistics of generated data (a row list or an already gathered DataSummary)"""
+    summary = data if isinstance(data, DataSummary) else summarize_data(data)
+    
+    print("\n" + "="*50)
+    print("DATA GENERATION SUMMARY")
+    print("="*50)
     
-    print(f"Total data points: {len(data):,}")
-    print(f"Event periods: {event_count:,} ({event_count/len(data)*100:.1f}%)")
-    print(f"Product categories: {len(product_stats)}")
+    print(f"Total data points: {summary.total_rows:,}")
+    print(f"Event periods: {summary.event_count:,} ({summary.event_count/summary.total_rows*100:.1f}%)")
+    print(f"Product categories: {len(summary.product_stats)}")
     
     print("\nDemand by Product Type:")
-    for product_type, sales in product_stats.items():
-        avg_sales = sum(sales) / len(sales)
-        max_sales = max(sales)
-        min_sales = min(sales)
+    for product_type, (count, total_sold, min_sales, max_sales) in summary.product_stats.items():
+        avg_sales = total_sold / count
         print(f"  {product_type:12}: Avg={avg_sales:6.1f}, Range=[{min_sales:4.0f}, {max_sales:4.0f}]")
     
     print("\nComplex patterns included for Prophet detection:")
@@ -434,15 +1024,192 @@ def print_data_summary(data: List[List]) -> None:
     print("✓ Supply disruption anomalies")
     print("✓ Event-driven demand spikes")
 
+# Replay mode emits the same demand model as a timed feed, one simulated day (every SKU's row
+# for that date) at a time, for load-testing the forecasting stack
+DEFAULT_DAYS_PER_SECOND = 1.0
+REPLAY_FORMATS = ['csv', 'jsonl']
+REPLAY_REPORT_SECONDS = 10.0
+
+def day_burst_factors(calendar: Dict, burst_scale: float) -> List[float]:
+    """How many times faster each simulated day is emitted: the day's strongest event boost, scaled
+
+    Only days near an event's peak burst; the rest of a holiday month replays at the base rate.
+    """
+    categories = calendar['categories'].values()
+    factors = []
+    for i in range(len(calendar['date_strings'])):
+        boost = 1.0
+        if calendar['near_event_peak'][i]:
+            boost = max((c['event_boost'][i] for c in categories if c['event_active'][i]), default=1.0)
+        factors.append(max(1.0, 1.0 + (boost - 1.0) * burst_scale))
+    return factors
+
+@contextlib.contextmanager
+def replay_sink(target: str):
+    """Text stream for '-' (stdout), tcp://host:port, unix:///path or a file path"""
+    if target == '-':
+        yield sys.stdout
+        sys.stdout.flush()
+    elif target.startswith('tcp://') or target.startswith('unix://'):
+        if target.startswith('tcp://'):
+            host, _, port = target[len('tcp://'):].rpartition(':')
+            conn = socket.create_connection((host or 'localhost', int(port)))
+        else:
+            conn = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            conn.connect(target[len('unix://'):])
+        with conn, conn.makefile('w', encoding='utf-8', newline='') as stream:
+            yield stream
+    else:
+        with open(target, 'w', newline='', encoding='utf-8') as stream:
+            yield stream
+
+def replay_stream(master_seed: int, num_skus: int, n_days: int, days_per_second: float = DEFAULT_DAYS_PER_SECOND,
+                  target: str = '-', replay_format: str = 'csv', burst_scale: float = 1.0) -> Dict:
+    """Emit the dataset day by day at days_per_second (0 = as fast as possible); returns emit-rate stats
+
+    Event days are emitted faster according to day_burst_factors, so the row rate bursts
+    around holidays. Each SKU draws from sku_rng, so the rows match sharded generation
+    with the same seed.
+    """
+    calendar = build_calendar_table(START_DATE, n_days)
+    bursts = day_burst_factors(calendar, burst_scale)
+    sku_streams = [iter_sku_rows(sku, calendar, sku_rng(master_seed, sku), verbose=False)
+                   for sku in range(1, num_skus + 1)]
+    
+    stats = {
+        'seed': master_seed,
+        'skus': num_skus,
+        'target_days_per_second': days_per_second,
+        'burst_scale': burst_scale,
+        'days': 0,
+        'rows': 0,
+        'burst_days': 0,
+        'max_lag_seconds': 0.0,
+        'interrupted': None
+    }
+    scheduled = 0.0  # Seconds after start at which the next day is due
+    started = time.perf_counter()
+    next_report = started + REPLAY_REPORT_SECONDS
+    
+    try:
+        with replay_sink(target) as stream:
+            writer = csv.writer(stream)
+            if replay_format == 'csv':
+                writer.writerow(CSV_HEADERS)
+            
+            for day in range(n_days):
+                if days_per_second > 0:
+                    lag = time.perf_counter() - started - scheduled
+                    if lag < 0:
+                        time.sleep(-lag)
+                    else:
+                        stats['max_lag_seconds'] = max(stats['max_lag_seconds'], lag)
+                    scheduled += 1.0 / (days_per_second * bursts[day])
+                
+                rows = [next(sku_rows) for sku_rows in sku_streams]
+                if replay_format == 'csv':
+                    writer.writerows(rows)
+                else:
+                    stream.write(''.join(json.dumps(dict(zip(CSV_HEADERS, row))) + '\n' for row in rows))
+                stream.flush()
+                
+                stats['days'] += 1
+                stats['rows'] += len(rows)
+                if bursts[day] > 1.0:
+                    stats['burst_days'] += 1
+                
+                now = time.perf_counter()
+                if now >= next_report:
+                    print(f"Replayed {stats['days']:,} days ({calendar['date_strings'][day]}), {stats['rows']:,} rows, "
+                          f"{stats['rows'] / (now - started):,.0f} rows/s", file=sys.stderr)
+                    next_report = now + REPLAY_REPORT_SECONDS
+    except (BrokenPipeError, ConnectionError) as e:
+        stats['interrupted'] = f"consumer disconnected: {e}"
+    except KeyboardInterrupt:
+        stats['interrupted'] = 'interrupted'
+    
+    elapsed = time.perf_counter() - started
+    stats['elapsed_seconds'] = round(elapsed, 3)
+    stats['achieved_days_per_second'] = round(stats['days'] / elapsed, 3) if elapsed > 0 else None
+    stats['achieved_rows_per_second'] = round(stats['rows'] / elapsed, 1) if elapsed > 0 else None
+    # What the schedule asked for over the days actually emitted, bursts included
+    stats['target_rows_per_second'] = round(stats['rows'] / scheduled, 1) if scheduled > 0 else None
+    stats['max_lag_seconds'] = round(stats['max_lag_seconds'], 4)
+    return stats
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description='Generate synthetic supply chain data with complex seasonality')
+    parser.add_argument('--skus', type=int, default=NUM_SKUS, help=f'Number of SKUs (default: {NUM_SKUS})')
+    parser.add_argument('--days', type=int, default=ENTRIES_PER_SKU, help=f'Days per SKU (default: {ENTRIES_PER_SKU})')
+    parser.add_argument('--output',
+                        help=f'File to write (default: {CSV_FILE_PATH}, with the --format extension)')
+    parser.add_argument('--format', choices=OUTPUT_FORMATS, default='csv',
+                        help='csv, or a typed columnar file: parquet/feather (need pyarrow) or npz (default: csv)')
+    parser.add_argument('--seed', type=int,
+                        help='Master seed: generate in shards with one random stream per SKU, '
+                             'giving identical data for any --workers')
+    parser.add_argument('--workers', type=int, default=1, help='Processes generating shards (requires --seed)')
+    parser.add_argument('--shard-dir', help='Directory for shard files (default: <output>.shards)')
+    parser.add_argument('--skus-per-shard', type=int, default=DEFAULT_SKUS_PER_SHARD,
+                        help=f'SKUs per shard file (default: {DEFAULT_SKUS_PER_SHARD})')
+    parser.add_argument('--replay', action='store_true',
+                        help='Emit rows as a timed day-by-day feed instead of writing a dataset')
+    parser.add_argument('--days-per-second', type=float, default=DEFAULT_DAYS_PER_SECOND,
+                        help=f'Replay speed in simulated days per second, 0 for unthrottled (default: {DEFAULT_DAYS_PER_SECOND})')
+    parser.add_argument('--replay-to', default='-',
+                        help="Replay destination: '-' (stdout), tcp://host:port, unix:///path or a file (default: -)")
+    parser.add_argument('--replay-format', choices=REPLAY_FORMATS, default='csv', help='Replay row format (default: csv)')
+    parser.add_argument('--burst-scale', type=float, default=1.0,
+                        help='Scale of the holiday speed-up; 0 replays every day at the same pace (default: 1.0)')
+    parser.add_argument('--replay-stats', help='Write the achieved emit rate as JSON to this file')
+    parser.add_argument('--no-merge', action='store_true',
+                        help='Keep the shard files without merging them (columnar shards are never merged)')
+    return parser.parse_args(argv)
+
 if __name__ == "__main__":
-    # Generate the enhanced dataset
-    enhanced_data = generate_enhanced_data()
+    args = parse_args(sys.argv[1:])
+    NUM_SKUS = args.skus
+    ENTRIES_PER_SKU = args.days
+    CSV_FILE_PATH = args.output or output_path_for(CSV_FILE_PATH, args.format)
+    
+    if args.replay:
+        master_seed = args.seed if args.seed is not None else random.randrange(2 ** 32)
+        stats = replay_stream(master_seed, args.skus, args.days, args.days_per_second,
+                              args.replay_to, args.replay_format, args.burst_scale)
+        target_rate = f", target {stats['target_rows_per_second']}" if stats['target_rows_per_second'] else ''
+        print(f"Replay finished: {stats['days']:,} days, {stats['rows']:,} rows in {stats['elapsed_seconds']}s "
+              f"({stats['achieved_rows_per_second']} rows/s{target_rate})", file=sys.stderr)
+        if args.replay_stats:
+            with open(args.replay_stats, 'w', encoding='utf-8') as f:
+                json.dump(stats, f, indent=2)
+        sys.exit(1 if stats['interrupted'] and stats['interrupted'] != 'interrupted' else 0)
+    
+    if args.format in ARROW_FORMATS and not pyarrow_available():
+        print(f"Error: --format {args.format} requires pyarrow (pip install pyarrow); --format npz needs only numpy",
+              file=sys.stderr)
+        sys.exit(1)
+    
+    if args.seed is not None:
+        shard_dir = args.shard_dir or f'{CSV_FILE_PATH}.shards'
+        shard_paths = generate_sharded_data(args.seed, args.skus, args.days, shard_dir,
+                                            args.workers, args.skus_per_shard, args.format)
+        if args.format != 'csv':
+            # Each shard holds whole SKUs, so the directory already is a SKU-partitioned dataset
+            print(f"Columnar shards are left as a dataset in {shard_dir}")
+        elif not args.no_merge:
+            merge_shards(shard_paths, CSV_FILE_PATH)
+        sys.exit(0)
+    if args.workers > 1 or args.shard_dir or args.no_merge:
+        print("Error: --workers, --shard-dir and --no-merge require --seed", file=sys.stderr)
+        sys.exit(1)
     
-    # Write to CSV
-    write_csv_data(enhanced_data)
+    # Stream the enhanced dataset straight to the output file, gathering the summary on the way
+    sku_labels = [sku_label(sku) for sku in range(1, NUM_SKUS + 1)]
+    summary = write_rows(iter_enhanced_data(), CSV_FILE_PATH, args.format, sku_labels)
+    print_output_report(CSV_FILE_PATH, summary, args.format)
     
     # Print summary
-    print_data_summary(enhanced_data)
+    print_data_summary(summary)
     
     print("\n" + "="*50)
     print("READY FOR PROPHET + XGBOOST TESTING!")